@@ -1,16 +1,39 @@
-from fastapi import APIRouter, Depends
-from app.core.auth import get_current_user
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.principals import Principal, get_current_principal
 from app.services.analytics_service import AnalyticsService
-from app.db.database import get_db
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from app.core.cache import MATERIALS, TRANSACTIONS, cached
+from typing import Dict, Any, Literal, Optional
 
 router = APIRouter()
 
 @router.get("/analytics/stats", response_model=Dict[str, Any])
+@cached(MATERIALS, TRANSACTIONS, expire=300)
 async def get_analytics_stats(
-    current_user = Depends(get_current_user),
-    service: AnalyticsService = Depends(lambda: AnalyticsService(next(get_db())))
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    service: AnalyticsService = Depends()
 ) -> Dict[str, Any]:
     """Get analytics statistics"""
-    return await service.get_stats() 
\ No newline at end of file
+    return await service.get_stats()
+
+@router.get("/analytics/timeseries")
+async def get_analytics_timeseries(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    bucket: Literal["hour", "day", "week", "month"] = "day",
+    group_by: Optional[Literal["industry", "location"]] = None,
+    format: Literal["jsonl", "columnar"] = "jsonl",
+    current_user: Principal = Depends(get_current_principal),
+    service: AnalyticsService = Depends()
+):
+    """Transactions created in [from, to) per time bucket, optionally broken down
+    by industry or location, streamed as JSON Lines or, with format=columnar, as an Arrow IPC stream"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    media_type = "application/x-ndjson" if format == "jsonl" else "application/vnd.apache.arrow.stream"
+    return StreamingResponse(
+        service.stream_timeseries(start, end, bucket=bucket, group_by=group_by, output=format),
+        media_type=media_type
+    )
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from app.core.principals import Principal, get_current_principal, oauth2_scheme, revoke_token
+
+router = APIRouter()
+
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Revoke the bearer token this request was made with"""
+    await revoke_token(token)
+    return {"message": "Logged out successfully"}
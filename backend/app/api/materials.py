@@ -1,68 +1,199 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.material_service import MaterialService
+from app.services.search_service import SearchService
+from app.services.geo_service import GeoService
+from app.services.bulk_service import BulkMaterialService
+from app.services.recommendation_service import RecommendationService
 from app.schemas.material import MaterialResponse, MaterialCreate, MaterialUpdate
-from app.core.dependencies import get_current_user
-from app.models.models import User, UserRole
+from app.schemas.pagination import Page
+from app.schemas.geo_schema import NearbyMaterial
+from app.schemas.recommendation_schema import RecommendedMaterial
+from app.schemas.bulk_schema import BulkImportResult
+from app.core.principals import Principal, get_current_principal
+from app.models.models import UserRole
 from app.models.models import Material
-from app.db.database import get_db
+from app.db.database import get_session
+from app.core.log import get_logger
+from app.core.cache import MATERIALS, cached
+from app.core.serialization import json_response, streaming_json_response
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/materials")
 
-@router.get("", response_model=List[MaterialResponse])
+@router.get("", response_model=Page[MaterialResponse])
+@cached(MATERIALS, expire=60)
 async def get_materials(
-    current_user = Depends(get_current_user),
+    request: Request,
+    industry: Optional[str] = None,
+    location: Optional[str] = None,
+    condition: Optional[str] = None,
+    status: Optional[str] = None,
+    min_quantity: Optional[float] = Query(None, ge=0),
+    max_quantity: Optional[float] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    current_user: Principal = Depends(get_current_principal),
     service: MaterialService = Depends()
 ):
+    """One page of the catalog, or with stream=json|ndjson every matching listing
+    from the cursor on, streamed as a JSON array or JSON Lines"""
     try:
-        materials = await service.get_materials()
-        return materials
+        if stream:
+            return streaming_json_response(
+                service.stream_materials(
+                    industry=industry,
+                    location=location,
+                    condition=condition,
+                    status=status,
+                    min_quantity=min_quantity,
+                    max_quantity=max_quantity,
+                    cursor=cursor
+                ),
+                stream
+            )
+        return json_response(await service.get_materials(
+            industry=industry,
+            location=location,
+            condition=condition,
+            status=status,
+            min_quantity=min_quantity,
+            max_quantity=max_quantity,
+            cursor=cursor,
+            limit=limit
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in get_materials route: {e}")
+        logger.exception("Error in get_materials route")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/search", response_model=Page[MaterialResponse])
+async def search_materials(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_principal),
+    service: SearchService = Depends()
+):
+    """Full-text search over listing name, description and industry, best matches first"""
+    return await service.search(q, limit=limit, cursor=cursor)
+
+@router.get("/nearby", response_model=List[NearbyMaterial])
+async def get_nearby_materials(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, le=1000),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_principal),
+    service: GeoService = Depends()
+):
+    """Listings within radius_km of a point, nearest first"""
+    return await service.get_nearby_materials(lat, lon, radius_km, limit)
+
+@router.get("/recommended", response_model=List[RecommendedMaterial])
+async def get_recommended_materials(
+    limit: int = Query(20, ge=1, le=100),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    current_user: Principal = Depends(get_current_principal),
+    service: RecommendationService = Depends()
+):
+    """Open listings matched to the current user's past requests, best first.
+    Proximity is measured from lat/lon when given."""
+    return await service.get_recommendations(current_user.id, limit, latitude=lat, longitude=lon)
+
 @router.post("", response_model=MaterialResponse)
 async def create_material(
     material: MaterialCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: MaterialService = Depends()
 ):
     try:
         return await service.create_material(material, current_user.id)
     except Exception as e:
-        print(f"Error creating material: {e}")
+        logger.exception("Error creating material", extra={"user_id": current_user.id})
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_materials(
+    request: Request,
+    format: Optional[Literal["csv", "jsonl"]] = None,
+    current_user: Principal = Depends(get_current_principal),
+    service: BulkMaterialService = Depends()
+):
+    """Create listings from a CSV (with a header row) or JSON Lines request body,
+    read as it is uploaded. The format defaults from the Content-Type."""
+    if format is None:
+        format = "jsonl" if "json" in request.headers.get("content-type", "") else "csv"
+    return await service.import_materials(request.stream(), format, current_user.id)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+@router.get("/export")
+async def export_materials(
+    format: Literal["csv", "jsonl", "parquet"] = "csv",
+    mine: bool = False,
+    industry: Optional[str] = None,
+    location: Optional[str] = None,
+    condition: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal),
+    service: BulkMaterialService = Depends()
+):
+    """Stream listings, or only the caller's with mine=true, in the import column layout"""
+    return StreamingResponse(
+        service.export_materials(
+            format,
+            owner_id=current_user.id if mine else None,
+            industry=industry,
+            location=location,
+            condition=condition,
+            status=status
+        ),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="materials.{format}"'}
+    )
+
 @router.delete("/{material_id}")
 async def delete_material(
     material_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: MaterialService = Depends()
 ):
     try:
         await service.delete_material(material_id, current_user.id)
         return {"message": "Material deleted successfully"}
     except Exception as e:
-        print(f"Error deleting material: {e}")
+        logger.exception("Error deleting material", extra={"material_id": material_id})
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{material_id:int}", response_model=MaterialResponse)
+@cached(MATERIALS, expire=300)
 async def get_material(
+    request: Request,
     material_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_session)
 ):
-    material = db.query(Material).filter(Material.id == material_id).first()
+    material = await db.get(Material, material_id)
     if not material:
         raise HTTPException(status_code=404, detail="Material not found")
-    return material 
+    return MaterialResponse.model_validate(material)
 
 @router.put("/{material_id}", response_model=MaterialResponse)
 async def update_material(
     material_id: int,
     material_update: MaterialUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: MaterialService = Depends()
 ):
     try:
@@ -76,6 +207,8 @@ async def update_material(
             raise HTTPException(status_code=403, detail="You can only update your own materials")
         
         return await service.update_material(material_id, material_update)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating material: {e}")
+        logger.exception("Error updating material", extra={"material_id": material_id})
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,46 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+import json
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Literal, Optional
 from app.schemas.notification_schema import Notification, NotificationCreate
-from app.services.notification_service import NotificationService
-from app.core.dependencies import get_current_user
+from app.schemas.pagination import Page
+from app.services.notification_service import (
+    TICKET_TTL, NotificationService, issue_stream_ticket, redeem_stream_ticket
+)
+from app.core.principals import Principal, get_current_principal
+from app.core.serialization import streaming_json_response
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
-@router.get("/", response_model=List[Notification])
+@router.get("/", response_model=Page[Notification])
 async def get_notifications(
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    read: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    current_user: Principal = Depends(get_current_principal),
+    notification_service: NotificationService = Depends()
 ):
-    service = NotificationService(db)
-    return await service.get_user_notifications(current_user.id)
+    """The current user's notifications, newest first (read=false for unread only).
+    With stream=json|ndjson, all of them from the cursor on as a JSON array or JSON Lines."""
+    if stream:
+        return streaming_json_response(
+            notification_service.stream_user_notifications(current_user.id, read=read, cursor=cursor),
+            stream
+        )
+    return await notification_service.get_user_notifications(current_user.id, read=read, cursor=cursor, limit=limit)
 
 @router.patch("/{notification_id}/read")
 async def mark_as_read(
-    notification_id: str,
-    current_user = Depends(get_current_user),
+    notification_id: int,
+    current_user: Principal = Depends(get_current_principal),
     notification_service: NotificationService = Depends()
 ):
     return await notification_service.mark_as_read(notification_id, current_user.id)
 
 @router.patch("/read-all")
 async def mark_all_as_read(
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     notification_service: NotificationService = Depends()
 ):
     return await notification_service.mark_all_as_read(current_user.id)
 
 @router.delete("/clear-all")
 async def clear_all_notifications(
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     notification_service: NotificationService = Depends()
 ):
     return await notification_service.clear_all(current_user.id)
 
 @router.get("/unread-count")
 async def get_unread_count(
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
+    notification_service: NotificationService = Depends()
+):
+    """From a per-user counter, shared between workers through Redis"""
+    return await notification_service.get_unread_count(current_user.id)
+
+async def server_sent_events(events: AsyncIterator[Optional[dict]]) -> AsyncIterator[str]:
+    async with aclosing(events):
+        # Reconnect after 3 seconds; EventSource resends the last id it saw as Last-Event-ID
+        yield "retry: 3000\n\n"
+        async for event in events:
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            message = f"event: {event['event']}\n"
+            if "id" in event:
+                message += f"id: {event['id']}\n"
+            yield message + f"data: {json.dumps(event['data'])}\n\n"
+
+@router.get("/stream")
+async def stream_notifications(
+    last_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+    current_user: Principal = Depends(get_current_principal),
+    notification_service: NotificationService = Depends()
+):
+    """Server-sent events: notifications after last_id (or Last-Event-ID), then new
+    ones as they happen, plus listing changes"""
+    events = notification_service.stream(current_user.id, last_event_id if last_event_id is not None else last_id)
+    return StreamingResponse(
+        server_sent_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/stream-ticket")
+async def create_stream_ticket(current_user: Principal = Depends(get_current_principal)):
+    """Single-use ticket for opening /notifications/ws"""
+    return {"ticket": await issue_stream_ticket(current_user.id), "expires_in": TICKET_TTL}
+
+@router.websocket("/ws")
+async def notification_socket(
+    websocket: WebSocket,
+    ticket: str,
+    last_id: Optional[int] = None,
     notification_service: NotificationService = Depends()
 ):
-    return await notification_service.get_unread_count(current_user.id)
\ No newline at end of file
+    """The same events as /notifications/stream as JSON messages. Authenticated with
+    a ticket from /notifications/stream-ticket, since browsers cannot set headers here."""
+    user_id = await redeem_stream_ticket(ticket)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    try:
+        async with aclosing(notification_service.stream(user_id, last_id)) as events:
+            async for event in events:
+                await websocket.send_json(event if event is not None else {"event": "keepalive"})
+        # The client fell too far behind; it should reconnect with its last id
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    except WebSocketDisconnect:
+        pass
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.auth import get_current_user
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.core.principals import Principal, get_current_principal
 from app.services.transaction_service import TransactionService
 from app.schemas.transaction_schema import TransactionCreate, TransactionResponse, TransactionUpdate
-from typing import List
+from typing import List, Literal, Optional
 from pydantic import BaseModel
+from app.schemas.pagination import Page
+from app.models.models import TransactionStatus, UserRole
+from app.core.cache import TRANSACTIONS, cached
+from app.core.serialization import json_response, streaming_json_response
 
 router = APIRouter()
 
@@ -16,67 +21,118 @@ class TransactionStats(BaseModel):
 @router.post("/transactions", response_model=TransactionResponse)
 async def create_transaction(
     transaction: TransactionCreate,
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Create a new transaction request"""
     return await service.create_transaction(transaction, current_user.id)
 
-@router.get("/transactions", response_model=List[TransactionResponse])
+@router.get("/transactions", response_model=Page[TransactionResponse])
 async def get_user_transactions(
-    current_user = Depends(get_current_user),
+    status: Optional[TransactionStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
-    """Get all transactions for the current user"""
-    return await service.get_user_transactions(current_user.id)
+    """Get the current user's transactions, newest first"""
+    return json_response(await service.get_user_transactions(
+        current_user.id,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        cursor=cursor,
+        limit=limit
+    ))
 
 @router.get("/transactions/stats", response_model=TransactionStats)
+@cached(TRANSACTIONS, expire=30, per_user=True)
 async def get_transaction_stats(
-    current_user = Depends(get_current_user),
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Get transaction statistics for the current user"""
     return await service.get_transaction_stats(current_user.id)
 
-@router.get("/transactions/incoming", response_model=List[TransactionResponse])
+@router.get("/transactions/incoming", response_model=Page[TransactionResponse])
 async def get_incoming_transactions(
-    current_user = Depends(get_current_user),
+    status: Optional[TransactionStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Get incoming transaction requests"""
-    return await service.get_incoming_transactions(current_user.id)
+    return json_response(await service.get_incoming_transactions(
+        current_user.id,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        cursor=cursor,
+        limit=limit
+    ))
 
-@router.get("/transactions/outgoing", response_model=List[TransactionResponse])
+@router.get("/transactions/outgoing", response_model=Page[TransactionResponse])
 async def get_outgoing_transactions(
-    current_user = Depends(get_current_user),
+    status: Optional[TransactionStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Get outgoing transaction requests"""
-    return await service.get_outgoing_transactions(current_user.id)
+    return json_response(await service.get_outgoing_transactions(
+        current_user.id,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        cursor=cursor,
+        limit=limit
+    ))
+
+@router.get("/transactions/all", response_model=List[TransactionResponse])
+async def get_all_transactions(
+    format: Literal["json", "ndjson"] = "json",
+    current_user: Principal = Depends(get_current_principal),
+    service: TransactionService = Depends()
+):
+    """Every transaction, newest first, streamed as a JSON array or JSON Lines (admins only)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can export all transactions")
+    return streaming_json_response(service.get_all_transactions(), format)
 
 @router.get("/transactions/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: int,
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Get a specific transaction"""
     return await service.get_transaction(transaction_id, current_user.id)
 
-@router.patch("/api/transactions/{transaction_id}/status", response_model=TransactionResponse)
+@router.patch("/transactions/{transaction_id}/status", response_model=TransactionResponse)
 async def update_transaction_status(
     transaction_id: int,
-    status: str,
-    current_user = Depends(get_current_user),
+    update: TransactionUpdate,
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Update transaction status"""
-    return await service.update_transaction_status(transaction_id, status, current_user.id)
+    return await service.update_transaction_status(
+        transaction_id, update.status.value, current_user.id, expected_version=update.version
+    )
 
 @router.get("/transactions/{transaction_id}/history")
 async def get_transaction_history(
     transaction_id: int,
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Get transaction history"""
@@ -85,7 +141,7 @@ async def get_transaction_history(
 @router.post("/transactions/{transaction_id}/complete", response_model=TransactionResponse)
 async def complete_transaction(
     transaction_id: int,
-    current_user = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     service: TransactionService = Depends()
 ):
     """Complete a transaction"""
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Dict, Optional, Set
+from prometheus_client import Gauge
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# "redis" fans events out to every worker; "local" only reaches subscribers in
+# this process, which is enough for a single worker
+EVENT_BUS = os.getenv("EVENT_BUS", "redis" if os.getenv("REDIS_URL") else "local").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CHANNEL_PREFIX = "industreuse:events:"
+# Events buffered per subscriber before it is considered too slow and dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+
+SUBSCRIBERS = Gauge("event_bus_subscribers", "Open event stream subscriptions in this process")
+
+class Subscription:
+    """Events for one stream. A subscriber that falls SUBSCRIBER_QUEUE_SIZE events
+    behind is cut off rather than buffered without bound; it resumes from the
+    last id it saw."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+
+    def put(self, event: dict) -> None:
+        if self.lagged:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """The next event, or None after `timeout` seconds without one.
+        Raises OverflowError once the subscriber has lagged and drained its backlog."""
+        if self.lagged and self._queue.empty():
+            raise OverflowError("Subscriber fell behind")
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class LocalBus:
+    """In-process publish/subscribe by channel name"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription()
+        for channel in channels:
+            self._subscribers[channel].add(subscription)
+        SUBSCRIBERS.inc()
+        try:
+            yield subscription
+        finally:
+            SUBSCRIBERS.dec()
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    async def publish(self, channel: str, event: dict) -> None:
+        self.deliver(channel, event)
+
+    def deliver(self, channel: str, event: dict) -> None:
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.put(event)
+
+class RedisBus(LocalBus):
+    """Publishes through Redis; one pattern subscription per process delivers
+    every event, including this process's own, to the local subscribers"""
+
+    def __init__(self, url: str):
+        super().__init__()
+        from redis import asyncio as aioredis
+        self._redis = aioredis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[Subscription]:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        async with super().subscribe(*channels) as subscription:
+            yield subscription
+
+    async def publish(self, channel: str, event: dict) -> None:
+        try:
+            await self._redis.publish(CHANNEL_PREFIX + channel, json.dumps(event))
+        except Exception:
+            # The write already committed; subscribers pick it up when they resume
+            logger.warning("Event publish failed", exc_info=True, extra={"channel": channel})
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"].decode()[len(CHANNEL_PREFIX):]
+                    self.deliver(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Event listener disconnected, retrying", exc_info=True)
+            finally:
+                # Each attempt holds its own connection; release it before the next
+                with suppress(Exception):
+                    await pubsub.reset()
+            await asyncio.sleep(1)
+
+bus = RedisBus(REDIS_URL) if EVENT_BUS == "redis" else LocalBus()
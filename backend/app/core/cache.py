@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from functools import wraps
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.types import Backend
+from prometheus_client import Counter
+from app.core.lru import LRUCache
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# "redis" shares entries and invalidations between workers; "memory" keeps them in
+# the process, for single-node and test setups; "none" turns caching off
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_PREFIX = "industreuse"
+
+# Tags; writers invalidate the ones their change touches
+MATERIALS = "materials"
+TRANSACTIONS = "transactions"
+
+CACHE_LOOKUPS = Counter("response_cache_lookups_total", "Cached route lookups", ["route", "result"])
+
+class LRUBackend(Backend):
+    """Process-local backend with a size bound; fastapi-cache's InMemoryBackend
+    never drops entries that are not read again"""
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return 0, None
+        value, expires_at = entry
+        return (-1 if expires_at is None else int(expires_at - time.monotonic())), value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + expire if expire else None
+        self._cache.set(key, (value, expires_at), ttl=expire or None)
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if key:
+            return int(self._cache.pop(key) is not None)
+        stale = [k for k in self._cache.keys() if namespace is None or k.startswith(namespace)]
+        for k in stale:
+            self._cache.pop(k)
+        return len(stale)
+
+def init_cache() -> None:
+    if CACHE_BACKEND == "redis":
+        from redis import asyncio as aioredis
+        from fastapi_cache.backends.redis import RedisBackend
+        backend = RedisBackend(aioredis.from_url(REDIS_URL))
+    else:
+        backend = LRUBackend(CACHE_MAX_ENTRIES)
+    FastAPICache.init(backend, prefix=CACHE_PREFIX, enable=CACHE_BACKEND != "none")
+
+def cache_backend() -> Optional[Backend]:
+    """The configured backend, or None when caching is off or was never set up (scripts)"""
+    if not FastAPICache.get_enable():
+        return None
+    try:
+        return FastAPICache.get_backend()
+    except AssertionError:
+        return None
+
+def user_tag(tag: str, user_id: int) -> str:
+    return f"{tag}:user:{user_id}"
+
+def tag_key(tag: str) -> str:
+    return f"{CACHE_PREFIX}:tag:{tag}"
+
+async def tag_version(backend: Backend, tag: str) -> str:
+    version = await backend.get(tag_key(tag))
+    if version is None:
+        # A lost version must never come back as an old one, so start a fresh one
+        version = secrets.token_hex(8).encode()
+        await backend.set(tag_key(tag), version)
+    return version.decode() if isinstance(version, bytes) else version
+
+async def invalidate(*tags: str) -> None:
+    """Retire every entry filed under these tags. Call after the write commits."""
+    backend = cache_backend()
+    if backend is None:
+        return
+    try:
+        await asyncio.gather(*(backend.set(tag_key(tag), secrets.token_hex(8).encode()) for tag in tags))
+    except Exception:
+        logger.warning("Cache invalidation failed", exc_info=True, extra={"tags": tags})
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cached(*tags: str, expire: int, per_user: bool = False):
+    """Cache a GET route's JSON body for `expire` seconds, with an ETag.
+
+    The key embeds the current version of each tag, so invalidate() orphans every
+    entry filed under it at once and the orphans age out. With per_user the key and
+    tags are scoped to current_user. The route must take `request: Request`. A
+    StreamingResponse from the route is passed through and not cached.
+    """
+    def decorator(func):
+        route = func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            user_id = kwargs["current_user"].id if per_user else None
+            scoped = [user_tag(tag, user_id) if per_user else tag for tag in tags]
+            backend = cache_backend()
+
+            key = body = None
+            if backend is not None:
+                try:
+                    versions = await asyncio.gather(*(tag_version(backend, tag) for tag in scoped))
+                    query = urlencode(sorted(request.query_params.multi_items()))
+                    key = f"{CACHE_PREFIX}:{request.url.path}?{query}:{user_id or '-'}:{'.'.join(versions)}"
+                    if request.headers.get("cache-control") != "no-cache":
+                        body = await backend.get(key)
+                except Exception:
+                    logger.warning("Cache lookup failed", exc_info=True, extra={"route": route})
+                    key = None
+
+            hit = body is not None
+            if not hit:
+                result = await func(*args, **kwargs)
+                if isinstance(result, StreamingResponse):
+                    # Streamed without being held whole; nothing to store
+                    return result
+                body = result.body if isinstance(result, Response) else JSONResponse(jsonable_encoder(result)).body
+                if key is not None:
+                    try:
+                        await backend.set(key, body, expire)
+                    except Exception:
+                        logger.warning("Cache store failed", exc_info=True, extra={"route": route})
+            CACHE_LOOKUPS.labels(route, "hit" if hit else "miss").inc()
+
+            etag = etag_for(body)
+            # Clients may keep the body but must revalidate; a matching ETag costs no body
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": "HIT" if hit else "MISS"}
+            if per_user:
+                headers["Vary"] = "Authorization"
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            return Response(body, media_type="application/json", headers=headers)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+import os
+import time
+from typing import Awaitable, Callable
+from app.core.cache import CACHE_MAX_ENTRIES, CACHE_PREFIX, cache_backend
+from app.core.lru import LRUCache
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds a counter lives before it is recounted, bounding any drift from a write
+# that landed between a seed's COUNT and its store
+COUNTER_TTL = int(os.getenv("COUNTER_TTL", "3600"))
+# Without Redis each process counts for itself; changes another process makes
+# reach this one's counters within this many seconds
+COUNTER_LOCAL_TTL = int(os.getenv("COUNTER_LOCAL_TTL", "10"))
+
+# key -> (value, expires_at)
+_local = LRUCache(maxsize=CACHE_MAX_ENTRIES)
+
+# Only a seeded counter moves; one that drifts below zero is dropped to be recounted
+_ADD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then return nil end
+local value = redis.call('incrby', KEYS[1], ARGV[1])
+if value < 0 then redis.call('del', KEYS[1]) end
+return value
+"""
+
+def counter_key(name: str, owner: int) -> str:
+    return f"{CACHE_PREFIX}:count:{name}:{owner}"
+
+def _redis():
+    """The Redis client behind the response cache, or None to count in the process"""
+    return getattr(cache_backend(), "redis", None)
+
+async def read_counter(key: str, count: Callable[[], Awaitable[int]]) -> int:
+    """The counter's value, seeded from `count` when it is missing or expired"""
+    redis = _redis()
+    if redis is None:
+        entry = _local.get(key)
+        if entry is not None:
+            return entry[0]
+        value = await count()
+        _local.set(key, (value, time.monotonic() + COUNTER_LOCAL_TTL), ttl=COUNTER_LOCAL_TTL)
+        return value
+
+    try:
+        value = await redis.get(key)
+        if value is not None:
+            return int(value)
+    except Exception:
+        logger.warning("Counter read failed", exc_info=True, extra={"key": key})
+        return await count()
+    value = await count()
+    try:
+        # Another request may have seeded it meanwhile, and writers may have moved it since
+        if not await redis.set(key, value, ex=COUNTER_TTL, nx=True):
+            current = await redis.get(key)
+            if current is not None:
+                return int(current)
+    except Exception:
+        logger.warning("Counter seed failed", exc_info=True, extra={"key": key})
+    return value
+
+async def add_to_counter(key: str, amount: int) -> None:
+    """Move a seeded counter by `amount`. Call after the write commits; an unseeded
+    counter is left alone, since its seed will count the write."""
+    redis = _redis()
+    if redis is None:
+        entry = _local.get(key)
+        if entry is None:
+            return
+        value, expires_at = entry[0] + amount, entry[1]
+        remaining = expires_at - time.monotonic()
+        if value < 0 or remaining <= 0:
+            _local.pop(key)
+        else:
+            _local.set(key, (value, expires_at), ttl=remaining)
+        return
+    try:
+        await redis.eval(_ADD_SCRIPT, 1, key, amount)
+    except Exception:
+        logger.warning("Counter update failed", exc_info=True, extra={"key": key})
+
+async def reset_counter(key: str) -> None:
+    """Drop the counter so the next read recounts it"""
+    redis = _redis()
+    if redis is None:
+        _local.pop(key)
+        return
+    try:
+        await redis.delete(key)
+    except Exception:
+        logger.warning("Counter reset failed", exc_info=True, extra={"key": key})
@@ -0,0 +1,160 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Environment knobs:
+#   LOG_LEVEL                 root level, e.g. INFO
+#   LOG_LEVELS                per-logger overrides, e.g. "app.services.auth_service=DEBUG,sqlalchemy.engine=WARNING"
+#   LOG_FORMAT                "json" (default) or "text"
+#   LOG_DEBUG_SAMPLE_RATE     fraction of logger.debug calls kept, 0..1
+#   LOG_DEBUG_RATE_LIMIT      max logger.debug calls per second per logger and message, 0 for no limit
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DebugSampler:
+    """Decides which DEBUG calls are worth a LogRecord.
+
+    Calls are kept with probability `sample_rate`, then limited to `per_second`
+    per call site with a token bucket, so a debug line inside a loop cannot
+    flood the output. The check runs before the record is built, which is most
+    of the cost of a log call.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, per_second: float = 0):
+        self.sample_rate = sample_rate
+        self.per_second = per_second
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: tuple) -> bool:
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if self.per_second <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.per_second, now]
+            tokens = min(self.per_second, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1
+            return True
+
+debug_sampler = DebugSampler()
+
+class SampledLogger:
+    """A Logger whose debug() goes through debug_sampler; everything else is the Logger's own"""
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def __getattr__(self, name):
+        return getattr(self._logger, name)
+
+    def debug(self, msg, *args, **kwargs) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG) and debug_sampler.allow((self._logger.name, msg)):
+            kwargs.setdefault("stacklevel", 2)
+            self._logger.debug(msg, *args, **kwargs)
+
+def get_logger(name: str) -> SampledLogger:
+    return SampledLogger(logging.getLogger(name))
+
+class BackgroundQueueHandler(QueueHandler):
+    """Enqueues records for the listener thread, which does the formatting and I/O"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the calling thread, since args and
+        # exc_info may not outlive the call, but keep `extra` for the JSON formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener: Optional[QueueListener] = None
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(stream=None) -> None:
+    """Route all logging through a queue drained by one background thread.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    handler = BackgroundQueueHandler(records)
+    debug_sampler.sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+    debug_sampler.per_second = float(os.getenv("LOG_DEBUG_RATE_LIMIT", "10"))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+    # Let uvicorn's loggers share the queue instead of writing to stderr themselves
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
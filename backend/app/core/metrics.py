@@ -0,0 +1,108 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+# By method only: the route is not known until routing has run
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served", ["method"])
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request; a jump after a deploy usually means an N+1",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+REQUEST_QUERY_TIME = Histogram(
+    "http_request_db_seconds",
+    "Total time spent in SQL statements per request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Latency of individual SQL statements", buckets=LATENCY_BUCKETS)
+VALIDATION_TIME = Histogram(
+    "pydantic_validation_duration_seconds",
+    "Time to build response models from ORM objects",
+    ["model"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# [statement count, seconds] for the request being served, shared with threadpool
+# workers and SQLAlchemy's greenlets through the copied context
+request_queries: ContextVar[Optional[List[float]]] = ContextVar("request_queries", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    QUERY_LATENCY.observe(elapsed)
+    totals = request_queries.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+def route_template(scope: Scope) -> str:
+    """The path pattern the request was routed to, e.g. /api/materials/{material_id}.
+    Raw paths would give every id its own time series."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    # The route only knows its own path; recover the prefixes it was included
+    # under from the part of the request path in front of it
+    path = scope["path"]
+    rendered = template
+    for name, value in scope.get("path_params", {}).items():
+        rendered = rendered.replace("{" + name + "}", str(value))
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + template
+    return template
+
+class PrometheusMiddleware:
+    """Per-route latency, in-flight requests and SQL statements per request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        totals = [0, 0.0]
+        token = request_queries.set(totals)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - start)
+            REQUEST_QUERIES.labels(method, route).observe(totals[0])
+            REQUEST_QUERY_TIME.labels(method, route).observe(totals[1])
+            in_flight.dec()
+            request_queries.reset(token)
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from prometheus_client import Counter, Histogram
+
+# bcrypt cost factor for new hashes; hashes made at any other cost are
+# replaced with one at this cost on the user's next successful login
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+# Threads that hash passwords. bcrypt releases the GIL, so these run in
+# parallel with each other and with the event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes running or waiting for a thread before further logins are turned away
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=PASSWORD_HASH_ROUNDS)
+
+PASSWORD_HASH_TIME = Histogram(
+    "password_hash_seconds",
+    "Time to hash or verify a password, including the wait for a worker",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected_total", "Hashes refused because the queue was full")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_slots = asyncio.BoundedSemaphore(PASSWORD_HASH_QUEUE)
+
+# Checked against when the account does not exist, so an unknown email takes
+# as long to refuse as a wrong password
+_DUMMY_HASH = pwd_context.hash("not a password")
+
+async def _run(operation: str, fn, *args):
+    """Run a hash in the pool without blocking the event loop; 503 when the
+    pool already has PASSWORD_HASH_QUEUE hashes in hand"""
+    if _slots.locked():
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    async with _slots:
+        with PASSWORD_HASH_TIME.labels(operation).time():
+            return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+async def verify_and_update(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Check a password against its stored hash. Also returns a replacement hash
+    when the stored one was made with other settings, else None."""
+    if not hashed_password:
+        await _run("verify", pwd_context.verify, password, _DUMMY_HASH)
+        return False, None
+    return await _run("verify", pwd_context.verify_and_update, password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    """Hash a new password at PASSWORD_HASH_ROUNDS. Runs in the caller's thread,
+    so it is for scripts and seeding, not request handlers."""
+    return pwd_context.hash(password)
@@ -0,0 +1,168 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from prometheus_client import Counter
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.cache import CACHE_PREFIX, cache_backend
+from app.core.log import get_logger
+from app.core.lru import LRUCache
+from app.core.security import ALGORITHM, SECRET_KEY
+from app.db.database import get_session
+from app.models.models import User, UserRole
+
+logger = get_logger(__name__)
+
+# Tokens whose principal is kept in this process. Entries last at most
+# PRINCIPAL_CACHE_TTL seconds, which bounds how long a role change or
+# revocation made by another worker goes unnoticed here.
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+PRINCIPAL_LOOKUPS = Counter("auth_principal_lookups_total", "Bearer token resolutions", ["result"])
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+class Principal:
+    """The caller as routes see it: enough to authorize a request without a User row"""
+
+    __slots__ = ("id", "email", "role", "company_name")
+
+    def __init__(self, id: int, email: str, role: UserRole, company_name: Optional[str]):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.company_name = company_name
+
+_credentials_error = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"}
+)
+
+# token id -> (Principal, time it was cached)
+_principals = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# user id -> when their account last changed; principals cached before that are stale
+_changed_at = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# token id -> when the token expires anyway; kept until then. Revocations are
+# also shared through the cache backend, which other workers check on a miss.
+_revoked: Dict[str, float] = {}
+_revoked_lock = threading.Lock()
+
+def token_id(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def revoked_key(key: str) -> str:
+    return f"{CACHE_PREFIX}:revoked:{key}"
+
+async def revoke_token(token: str) -> None:
+    """Refuse this token from now on, e.g. on logout. Other workers stop
+    accepting it within PRINCIPAL_CACHE_TTL, when the cache backend is shared."""
+    try:
+        expires_at = float(jwt.get_unverified_claims(token).get("exp") or math.inf)
+    except JWTError:
+        return
+    key = token_id(token)
+    now = time.time()
+    if expires_at <= now:
+        return
+    with _revoked_lock:
+        for stale in [k for k, until in _revoked.items() if until <= now]:
+            del _revoked[stale]
+        _revoked[key] = expires_at
+    _principals.pop(key)
+
+    backend = cache_backend()
+    if backend is None:
+        return
+    try:
+        # Kept as long as the token would have been accepted
+        await backend.set(revoked_key(key), b"1", None if expires_at == math.inf else math.ceil(expires_at - now))
+    except Exception:
+        logger.warning("Failed to share token revocation", exc_info=True)
+
+async def _revoked_elsewhere(key: str) -> bool:
+    backend = cache_backend()
+    if backend is None:
+        return False
+    try:
+        return await backend.get(revoked_key(key)) is not None
+    except Exception:
+        logger.warning("Revocation lookup failed", exc_info=True)
+        return False
+
+def invalidate_user(user_id: int) -> None:
+    """Drop every cached principal of this user, after a change to their role or account"""
+    _changed_at.set(user_id, time.monotonic())
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_session)
+) -> Principal:
+    """The authenticated caller. The token's claims and the user's role are
+    cached per token, so a repeat request does no decoding and no query."""
+    key = token_id(token)
+    if key in _revoked:
+        PRINCIPAL_LOOKUPS.labels("revoked").inc()
+        raise _credentials_error
+    cached = _principals.get(key)
+    if cached is not None:
+        principal, cached_at = cached
+        changed_at = _changed_at.get(principal.id)
+        if changed_at is None or changed_at < cached_at:
+            PRINCIPAL_LOOKUPS.labels("hit").inc()
+            return principal
+
+    if await _revoked_elsewhere(key):
+        PRINCIPAL_LOOKUPS.labels("revoked").inc()
+        raise _credentials_error
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = int(claims["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        PRINCIPAL_LOOKUPS.labels("invalid").inc()
+        raise _credentials_error
+    cached_at = time.monotonic()
+    row = (await db.execute(
+        select(User.id, User.email, User.role, User.company_name).where(User.id == user_id)
+    )).first()
+    if row is None:
+        PRINCIPAL_LOOKUPS.labels("invalid").inc()
+        raise _credentials_error
+    PRINCIPAL_LOOKUPS.labels("miss").inc()
+
+    principal = Principal(row.id, row.email, row.role or UserRole.USER, row.company_name)
+    # Never outlive the token itself
+    ttl = PRINCIPAL_CACHE_TTL
+    if claims.get("exp"):
+        ttl = min(ttl, float(claims["exp"]) - time.time())
+    if ttl > 0:
+        _principals.set(key, (principal, cached_at), ttl=ttl)
+    return principal
+
+@event.listens_for(Session, "after_flush")
+def track_user_changes(session: Session, flush_context) -> None:
+    """Note users whose role, email or company changed, or who were deleted"""
+    changed = session.info.setdefault("changed_users", set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in ("role", "email", "company_name")):
+                changed.add(obj.id)
+    changed.update(obj.id for obj in session.deleted if isinstance(obj, User))
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_users(session: Session) -> None:
+    session.info.pop("changed_users", None)
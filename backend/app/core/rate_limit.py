@@ -0,0 +1,37 @@
+import math
+import os
+import time
+from fastapi import HTTPException, Request, status
+from limits import parse
+from prometheus_client import Counter
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+# Redis shares the counters between workers; memory keeps them per process
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", os.getenv("REDIS_URL", "memory://"))
+# Login attempts allowed per account and per client address, in limits' notation
+LOGIN_RATE_LIMIT_ACCOUNT = os.getenv("LOGIN_RATE_LIMIT_ACCOUNT", "10/minute")
+LOGIN_RATE_LIMIT_IP = os.getenv("LOGIN_RATE_LIMIT_IP", "30/minute")
+
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE)
+
+LOGIN_THROTTLED = Counter("login_throttled_total", "Login attempts refused by the rate limit", ["key"])
+
+_login_limits = (
+    ("account", parse(LOGIN_RATE_LIMIT_ACCOUNT)),
+    ("ip", parse(LOGIN_RATE_LIMIT_IP)),
+)
+
+def check_login_rate(request: Request, email: str) -> None:
+    """Count a login attempt against the account and the client's address;
+    429 once either is over its limit, before any hashing is done"""
+    identifiers = {"account": email.strip().lower(), "ip": get_remote_address(request)}
+    for key, limit in _login_limits:
+        if not limiter.limiter.hit(limit, "login", key, identifiers[key]):
+            LOGIN_THROTTLED.labels(key).inc()
+            reset_time = limiter.limiter.get_window_stats(limit, "login", key, identifiers[key]).reset_time
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(reset_time - time.time())))}
+            )
@@ -0,0 +1,46 @@
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+import orjson
+from fastapi.responses import Response, StreamingResponse
+
+# Items encoded per chunk of a streamed response
+STREAM_CHUNK_ROWS = 500
+STREAM_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Encode plain dicts and lists straight to JSON bytes with orjson.
+
+    FastAPI passes a returned Response through untouched, skipping the
+    response_model validation and jsonable_encoder pass, which cost far more
+    than the query on large pages. The content must already have the model's
+    shape; the route keeps response_model for its schema.
+    """
+    return Response(orjson.dumps(content), media_type="application/json", headers=headers)
+
+def _chunk(encoded: List[bytes], array: bool, first: bool) -> bytes:
+    if array:
+        return (b"[" if first else b",") + b",".join(encoded)
+    return b"\n".join(encoded) + b"\n"
+
+async def stream_json(items: AsyncIterator[Any], format: str = "json") -> AsyncIterator[bytes]:
+    """Encode items as one JSON array, or as NDJSON with one item per line,
+    STREAM_CHUNK_ROWS at a time, so memory holds one chunk whatever the total.
+    Closes `items` when the client goes away, which ends its cursor."""
+    array = format == "json"
+    first = True
+    encoded = []
+    async with aclosing(items):
+        async for item in items:
+            encoded.append(orjson.dumps(item))
+            if len(encoded) >= STREAM_CHUNK_ROWS:
+                yield _chunk(encoded, array, first)
+                first = False
+                encoded = []
+    if encoded:
+        yield _chunk(encoded, array, first)
+        first = False
+    if array:
+        yield b"[]" if first else b"]"
+
+def streaming_json_response(items: AsyncIterator[Any], format: str = "json") -> StreamingResponse:
+    return StreamingResponse(stream_json(items, format), media_type=STREAM_MEDIA_TYPES[format])
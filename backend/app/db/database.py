@@ -0,0 +1,192 @@
+import asyncio
+import os
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, observe_pool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./industreuse.db")
+
+# "async" serves requests from an AsyncSession on asyncpg/aiosqlite; "sync" runs a
+# regular Session in the threadpool behind the same awaitable interface. Scripts
+# always use the sync engine.
+DB_MODE = os.getenv("DB_MODE", "async").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds a checkout waits for a free connection before raising
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this many seconds are replaced on checkout (-1 to keep forever)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test each connection with a cheap round trip on checkout, so restarts and idle
+# disconnects surface as a reconnect instead of a failed request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server-side limit per statement (PostgreSQL only), 0 for none
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_url(url: URL) -> URL:
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def engine_options(url: URL, is_async: bool = False) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases live in a single connection; there is no pool to size
+            return options
+    elif DB_STATEMENT_TIMEOUT_MS > 0:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    return options
+
+url = make_url(DATABASE_URL)
+engine = create_engine(url, **engine_options(url))
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+async_engine = create_async_engine(async_url(url), **engine_options(url, is_async=True)) \
+    if DB_MODE == "async" else None
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) \
+    if async_engine is not None else None
+
+observe_pool("sync", engine)
+# Sync-mode sessions that may hold a connection at once; see SyncSessionAdapter
+sync_connections = asyncio.Semaphore(engine.pool.size() + DB_MAX_OVERFLOW) \
+    if isinstance(engine.pool, QueuePool) else None
+if async_engine is not None:
+    observe_pool("async", async_engine.sync_engine)
+
+Base = declarative_base()
+
+class StreamedResult:
+    """Async iteration over a server-side result, one partition per call into `run`"""
+
+    def __init__(self, result, run):
+        self._partitions = result.partitions()
+        self._run = run
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def _rows(self):
+        while True:
+            partition = await self._run(next, self._partitions, None)
+            if partition is None:
+                return
+            for row in partition:
+                yield row
+
+class SyncSessionAdapter:
+    """The part of the AsyncSession API the services use, backed by a regular
+    Session whose I/O runs in the threadpool (DB_MODE=sync).
+
+    A session takes one of `connections` before its first statement and gives it
+    back when its transaction ends, so requests queue for a connection on the
+    event loop. Left to wait in pool checkout instead, they would each tie up a
+    threadpool worker, and once those ran out the requests holding connections
+    could not run the statements that release them.
+    """
+
+    def __init__(self, session: Session, connections: Optional[asyncio.Semaphore] = None):
+        self.sync_session = session
+        self._connections = connections
+        self._holding = False
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._connections is not None and not self._holding:
+            await self._connections.acquire()
+            self._holding = True
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def _release(self) -> None:
+        if self._holding:
+            self._holding = False
+            self._connections.release()
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    async def execute(self, statement, params=None, **kwargs):
+        # Buffer rows like AsyncSession does, so iterating never touches the cursor
+        kwargs.setdefault("execution_options", {"prebuffer_rows": True})
+        return await self._run(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def stream(self, statement, params=None, **kwargs) -> StreamedResult:
+        kwargs.setdefault("execution_options", {"stream_results": True})
+        result = await self._run(self.sync_session.execute, statement, params, **kwargs)
+        return StreamedResult(result, self._run)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await self._run(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await self._run(self.sync_session.commit)
+        self._release()
+
+    async def rollback(self) -> None:
+        await self._run(self.sync_session.rollback)
+        self._release()
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            self._release()
+
+def get_db() -> Iterator[Session]:
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """Request-scoped session for the service layer, per DB_MODE"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+    session = SyncSessionAdapter(SessionLocal(expire_on_commit=False), sync_connections)
+    try:
+        yield session
+    finally:
+        await session.close()
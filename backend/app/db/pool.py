@@ -0,0 +1,46 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+POOL_SIZE = Gauge("db_pool_size", "Configured number of persistent connections", ["engine"])
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently lent out to sessions", ["engine"])
+POOL_CHECKED_IN = Gauge("db_pool_checked_in", "Idle connections waiting in the pool", ["engine"])
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ["engine"])
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to obtain a connection from the pool, including pre-ping",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection", ["engine"])
+
+def engine_label(pool) -> str:
+    return "async" if getattr(pool._dialect, "is_async", False) else "sync"
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits"""
+
+    def connect(self):
+        label = engine_label(self)
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(label).inc()
+            raise
+        finally:
+            POOL_WAIT.labels(label).observe(time.perf_counter() - start)
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+def observe_pool(label: str, engine) -> None:
+    """Export the engine's pool occupancy; read at scrape time, so it follows pool recreation"""
+    if not isinstance(engine.pool, QueuePool):
+        return
+    POOL_SIZE.labels(label).set_function(lambda: engine.pool.size())
+    POOL_CHECKED_OUT.labels(label).set_function(lambda: engine.pool.checkedout())
+    POOL_CHECKED_IN.labels(label).set_function(lambda: engine.pool.checkedin())
+    # overflow() counts up from -pool_size while the pool is still filling
+    POOL_OVERFLOW.labels(label).set_function(lambda: max(engine.pool.overflow(), 0))
@@ -1,16 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.database import engine
 from app.models.models import Base
 from app.api import api_router
 from app.core.auth import router as auth_router
+from app.api.auth import router as logout_router
 from app.api.materials import router as materials_router
 from app.api.transactions import router as transactions_router
 from app.api.notification import router as notifications_router
 from app.api.analytics import router as analytics_router
-from fastapi.responses import JSONResponse
+import app.services.rollup_service  # noqa: F401 - registers rollup maintenance on every flush
+import app.services.webhook_service  # noqa: F401 - registers the webhook outbox consumer when configured
+from app.services.outbox import OUTBOX_WORKER, worker as outbox_worker
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.core.log import configure_logging, get_logger
+from app.core.metrics import PrometheusMiddleware
+from app.core.cache import init_cache
 
-app = FastAPI()
+configure_logging()
+init_cache()
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(outbox_worker.run()) if OUTBOX_WORKER else None
+    yield
+    if task is not None:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -21,8 +44,11 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+app.add_middleware(PrometheusMiddleware)
 
 # Include routers
+# Ahead of auth_router, so its logout revokes the token
+app.include_router(logout_router, prefix="/api/auth", tags=["auth"])
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 app.include_router(materials_router, prefix="/api", tags=["materials"])
 app.include_router(transactions_router, prefix="/api", tags=["transactions"])
@@ -32,8 +58,13 @@ app.include_router(analytics_router, prefix="/api", tags=["analytics"])
 # Add error handling
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    print(f"Internal Server Error: {str(exc)}")  # Add logging
+    logger.error("Internal Server Error", exc_info=exc, extra={"path": request.url.path})
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error"}
-    )
\ No newline at end of file
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum as SQLEnum, Boolean, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, ForeignKey, DateTime, Enum as SQLEnum, Boolean, Text, Index, JSON, UniqueConstraint, func, literal_column, text
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects import postgresql  # registers the typed to_tsvector()/to_tsquery() functions
+from sqlalchemy.orm import relationship, column_property
 from app.db.database import Base
 from datetime import datetime
 from enum import Enum
@@ -15,6 +17,56 @@ class TransactionStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+# Stored codes; append new statuses, never renumber existing ones
+TRANSACTION_STATUS_CODES = {
+    TransactionStatus.PENDING: 0,
+    TransactionStatus.ACCEPTED: 1,
+    TransactionStatus.REJECTED: 2,
+    TransactionStatus.COMPLETED: 3,
+    TransactionStatus.CANCELLED: 4,
+}
+_STATUSES_BY_CODE = {code: status.value for status, code in TRANSACTION_STATUS_CODES.items()}
+
+class TransactionStatusCode(TypeDecorator):
+    """A TransactionStatus kept in a SMALLINT. Comparisons bind the code and
+    rows read back the plain status string, so callers never see the number."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return TRANSACTION_STATUS_CODES[TransactionStatus(value)]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return _STATUSES_BY_CODE[value]
+
+def search_document(name, description, industry):
+    """Full-text document for a listing; the GIN index on materials is built on this exact expression"""
+    # Literal SQL rather than bound parameters so queries render byte-for-byte
+    # the same expression as the index and the planner can use it
+    empty, space = literal_column("''"), literal_column("' '")
+    return func.to_tsvector(
+        literal_column("'simple'::regconfig"),
+        func.coalesce(name, empty).op("||")(space)
+        .op("||")(func.coalesce(description, empty)).op("||")(space)
+        .op("||")(func.coalesce(industry, empty))
+    )
+
+_postgis_available = {}
+
+def has_postgis(bind) -> bool:
+    """Whether the database behind `bind` has the PostGIS extension (checked once per database)"""
+    if bind is None or bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.engine.url)
+    if key not in _postgis_available:
+        row = bind.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")).first()
+        _postgis_available[key] = row is not None
+    return _postgis_available[key]
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -35,19 +87,50 @@ class Material(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     description = Column(String)
-    quantity = Column(Float)
+    # active_history keeps the previous value on change even when it was not
+    # loaded, so analytics rollups can move the listing between buckets
+    quantity = column_property(Column(Float), active_history=True)
+    # Held by pending and accepted transactions; only quantity - reserved can be requested
+    reserved = Column(Float, nullable=False, default=0.0, server_default=text("0"))
     unit = Column(String)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Part of the catalog's keyset, which never matches NULL; see backfill_created_at
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     industry = Column(String)
     location = Column(String)
     condition = Column(String)
     status = Column(String, default='available')
     provider = Column(String)
+    # Resolved from `location` through the gazetteer; geohash drives proximity search
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12), index=True)
 
     owner = relationship("User", back_populates="materials")
     transactions = relationship("Transaction", back_populates="material")
 
+    # Keyset pagination walks (created_at, id) newest first; each catalog filter
+    # gets its own composite index so a filtered page is a single range scan.
+    __table_args__ = (
+        Index("ix_materials_created_at_id", "created_at", "id"),
+        Index("ix_materials_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_materials_industry_created_at_id", "industry", "created_at", "id"),
+        Index("ix_materials_location_created_at_id", "location", "created_at", "id"),
+        Index("ix_materials_condition_created_at_id", "condition", "created_at", "id"),
+        # PostgreSQL only; SQLite deployments use the in-process index in app.services.search_index
+        Index(
+            "ix_materials_search",
+            search_document(name, description, industry),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        # Only when the PostGIS extension is installed; otherwise the geohash index is used
+        Index(
+            "ix_materials_geography",
+            text("(ST_MakePoint(longitude, latitude)::geography)"),
+            postgresql_using="gist"
+        ).ddl_if(callable_=lambda ddl, target, bind, **kw: has_postgis(bind)),
+    )
+
 class Transaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True, index=True)
@@ -55,16 +138,28 @@ class Transaction(Base):
     from_owner_id = Column(Integer, ForeignKey("users.id"))
     to_owner_id = Column(Integer, ForeignKey("users.id"))
     quantity = Column(Float)
-    status = Column(String)
+    status = column_property(Column(TransactionStatusCode, nullable=False), active_history=True)
     message = Column(Text)
     delivery_method = Column(String)
     delivery_date = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Bumped on every update; a change made from a stale read fails instead of overwriting
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
 
     material = relationship("Material", back_populates="transactions")
     from_user = relationship("User", foreign_keys=[from_owner_id], back_populates="transactions_sent")
     to_user = relationship("User", foreign_keys=[to_owner_id], back_populates="transactions_received")
 
+    # Per-user status counts read each side of the trade from its own index, and
+    # per-user listings walk (owner, created_at, id) for keyset pagination
+    __table_args__ = (
+        Index("ix_transactions_from_owner_status", "from_owner_id", "status"),
+        Index("ix_transactions_to_owner_status", "to_owner_id", "status"),
+        Index("ix_transactions_from_owner_created_at_id", "from_owner_id", "created_at", "id"),
+        Index("ix_transactions_to_owner_created_at_id", "to_owner_id", "created_at", "id"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True, index=True)
@@ -75,4 +170,59 @@ class Notification(Base):
     read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="notifications") 
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+
+    # Unread counts and mark-all-read touch only the user's unread range, and
+    # listings walk (user_id, created_at, id) for keyset pagination
+    __table_args__ = (
+        Index("ix_notifications_user_read_created_at_id", "user_id", "read", "created_at", "id"),
+        Index("ix_notifications_user_created_at_id", "user_id", "created_at", "id"),
+    )
+
+class GazetteerEntry(Base):
+    """Local place-name lookup used to geocode listings without network calls"""
+    __tablename__ = "gazetteer"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)  # normalized: lowercase, no accents
+    display_name = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+
+class AnalyticsRollup(Base):
+    """Pre-aggregated dashboard counters, kept current on every flush by app.services.rollup_service"""
+    __tablename__ = "analytics_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String, nullable=False)  # transactions | users | active_materials
+    granularity = Column(String, nullable=False)  # hour | day | total
+    bucket_start = Column(DateTime, nullable=False)
+    dimension = Column(String, nullable=False, default="")  # "" | status | material | location
+    dimension_value = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "metric", "granularity", "bucket_start", "dimension", "dimension_value",
+            name="uq_analytics_rollups_key"
+        ),
+        Index("ix_analytics_rollups_ranking", "metric", "granularity", "dimension", "count"),
+    )
+
+class OutboxEvent(Base):
+    """Side effect of a write, stored in the write's own transaction and delivered
+    to its consumers by app.services.outbox"""
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)  # e.g. transaction.created
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Next time a worker may pick the event up: now, after a retry delay, or when a claim lapses
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    delivered_to = Column(JSON, nullable=False, default=list)  # consumers already done
+    last_error = Column(Text)
+    failed = Column(Boolean, nullable=False, default=False)  # out of attempts
+
+    __table_args__ = (
+        Index("ix_outbox_events_due", "failed", "available_at", "id"),
+    )
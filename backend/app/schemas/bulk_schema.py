@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+
+class RowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[RowError]
+    # Only the first MAX_REPORTED_ERRORS failures are listed
+    errors_truncated: bool = False
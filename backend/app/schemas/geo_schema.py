@@ -0,0 +1,6 @@
+from app.schemas.material import MaterialResponse
+
+class NearbyMaterial(MaterialResponse):
+    latitude: float
+    longitude: float
+    distance_km: float
@@ -0,0 +1,4 @@
+from app.schemas.material import MaterialResponse
+
+class RecommendedMaterial(MaterialResponse):
+    score: float
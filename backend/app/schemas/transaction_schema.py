@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 from datetime import datetime
+from app.core.metrics import VALIDATION_TIME
+from app.models.models import TransactionStatus
 
 class MaterialInfo(BaseModel):
     id: int
@@ -23,7 +25,7 @@ class UserInfo(BaseModel):
 
 class TransactionBase(BaseModel):
     material_id: int
-    quantity: float
+    quantity: float = Field(gt=0)
     message: Optional[str] = None
     delivery_method: Optional[str] = None
     delivery_date: Optional[str] = None
@@ -42,11 +44,19 @@ class TransactionResponse(BaseModel):
     delivery_method: Optional[str] = None
     delivery_date: Optional[str] = None
     created_at: datetime
+    version: int
     material: MaterialInfo
     from_user: UserInfo
     to_user: UserInfo
     
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def model_validate(cls, obj, **kwargs):
+        with VALIDATION_TIME.labels(cls.__name__).time():
+            return super().model_validate(obj, **kwargs)
+
 class TransactionUpdate(BaseModel):
-    status: str 
\ No newline at end of file
+    status: TransactionStatus
+    # The version the client last read; the change is refused with 409 if it moved since
+    version: Optional[int] = None 
\ No newline at end of file
@@ -1,71 +1,204 @@
+import json
+from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from app.models.models import Transaction
-from app.models.models import Material
-from app.models.models import User
-from typing import Dict, Any, List
+from sqlalchemy import case, func
+from app.models.models import Material, Transaction, TransactionStatus
+from typing import Dict, Any, AsyncIterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.db.database import get_db
+from app.db.database import get_session
+from app.services.geo_service import known_locations
+from app.services.rollup_service import TRANSACTIONS, USERS, ACTIVE_MATERIALS, bucket_start, dashboard_query
+from app.services.search_index import normalize
+from app.services.bulk_service import ChunkSink
+
+# Count trends are the growth over the last TREND_WINDOW_DAYS of daily buckets;
+# the success rate trend compares that window with the one before it
+TREND_WINDOW_DAYS = 7
+# Rows per round trip, and per Arrow record batch, when streaming a time series
+TIMESERIES_BATCH_SIZE = 1000
+
+BUCKETS = ("hour", "day", "week", "month")
+GROUP_COLUMNS = {
+    "industry": Material.industry,
+    "location": Material.location,
+}
+
+# SQLite has no date_trunc; these strftime/date() forms produce the same bucket starts
+SQLITE_BUCKETS = {
+    "hour": lambda column: func.strftime("%Y-%m-%dT%H:00:00", column),
+    "day": lambda column: func.strftime("%Y-%m-%dT00:00:00", column),
+    "week": lambda column: func.date(column, "-6 days", "weekday 1") + "T00:00:00",
+    "month": lambda column: func.strftime("%Y-%m-01T00:00:00", column),
+}
+
+def success_rate(completed: int, total: int) -> float:
+    return (completed / total * 100) if total > 0 else 0
+
+def format_trend(value: float) -> str:
+    return f"{value:+d}" if isinstance(value, int) else f"{value:+.1f}"
 
 class AnalyticsService:
-    def __init__(self, db=Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_session)):
         self.db = db
 
     async def get_stats(self) -> Dict[str, Any]:
-        # Get basic stats for all time
-        total_transactions = self.db.query(Transaction).count()
-        active_materials = self.db.query(Material).filter(Material.quantity > 0).count()
-        total_users = self.db.query(User).count()
-        
-        # Calculate success rate
-        completed_transactions = self.db.query(Transaction).filter(
-            Transaction.status == 'COMPLETED'
-        ).count()
-        success_rate = (completed_transactions / total_transactions * 100) if total_transactions > 0 else 0
-
-        # Get status distribution
-        status_distribution = self.db.query(
-            Transaction.status,
-            func.count(Transaction.id).label('count')
-        ).group_by(Transaction.status).all()
-
-        # Get top materials
-        top_materials = self.db.query(
-            Material.name,
-            func.count(Transaction.id).label('transactions')
-        ).join(Transaction).group_by(Material.name).order_by(
-            func.count(Transaction.id).desc()
-        ).limit(10).all()
-
-        # Get transaction locations
-        transaction_locations = self.db.query(
-            Material.location,
-            func.count(Transaction.id).label('count')
-        ).join(Transaction).group_by(Material.location).all()
+        # Everything comes from the rollup table in a single query
+        today = bucket_start(datetime.utcnow(), "day")
+        window_start = today - timedelta(days=TREND_WINDOW_DAYS - 1)
+        previous_start = window_start - timedelta(days=TREND_WINDOW_DAYS)
+        rows = (await self.db.execute(dashboard_query(since=previous_start))).all()
+
+        totals: Dict[str, int] = defaultdict(int)
+        status_distribution: Dict[str, int] = defaultdict(int)
+        top_materials: List[Dict[str, Any]] = []
+        locations: Dict[str, int] = defaultdict(int)
+        # [previous window, current window] per metric, and per status for transactions
+        windows: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+        for row in rows:
+            if row.granularity == "total":
+                if row.dimension == "material":
+                    top_materials.append({"name": row.dimension_value, "transactions": row.count})
+                elif row.dimension == "location":
+                    locations[row.dimension_value] += row.count
+                elif row.dimension == "status":
+                    totals[row.metric] += row.count
+                    status_distribution[row.dimension_value] += row.count
+                else:
+                    totals[row.metric] += row.count
+            else:
+                current = int(row.bucket_start >= window_start)
+                key = f"{row.metric}:{row.dimension_value}" if row.dimension == "status" else row.metric
+                windows[key][current] += row.count
+                if row.dimension == "status":
+                    windows[row.metric][current] += row.count
+
+        total_transactions = totals[TRANSACTIONS]
+        completed = status_distribution.get(TransactionStatus.COMPLETED.value, 0)
+        completed_key = f"{TRANSACTIONS}:{TransactionStatus.COMPLETED.value}"
+        rate_trend = success_rate(windows[completed_key][1], windows[TRANSACTIONS][1]) - \
+            success_rate(windows[completed_key][0], windows[TRANSACTIONS][0])
+        places = await self.db.run_sync(known_locations)
 
         return {
             "totalTransactions": total_transactions,
-            "activeMaterials": active_materials,
-            "totalUsers": total_users,
-            "successRate": round(success_rate, 2),
-            "materialsTrend": "+12",
-            "transactionsTrend": "+5",
-            "successRateTrend": "+18",
-            "usersTrend": "+2",
+            "activeMaterials": totals[ACTIVE_MATERIALS],
+            "totalUsers": totals[USERS],
+            "successRate": round(success_rate(completed, total_transactions), 2),
+            "materialsTrend": format_trend(windows[ACTIVE_MATERIALS][1]),
+            "transactionsTrend": format_trend(windows[TRANSACTIONS][1]),
+            "successRateTrend": format_trend(round(rate_trend, 1)),
+            "usersTrend": format_trend(windows[USERS][1]),
             "statusDistribution": [
-                {"status": s.status, "value": s.count}
-                for s in status_distribution
-            ],
-            "topMaterials": [
-                {"name": m.name, "transactions": m.transactions}
-                for m in top_materials
+                {"status": status, "value": count}
+                for status, count in status_distribution.items()
+                if count
             ],
+            "topMaterials": sorted(top_materials, key=lambda m: m["transactions"], reverse=True),
             "transactionLocations": [
-                {"location": loc.location, "count": loc.count}
-                for loc in transaction_locations
-                if loc.location in [
-                    'Tunis', 'Sfax', 'Sousse', 'Bizerte', 
-                    'Gabes', 'Ben Arous', 'Megrine', 'Rades'
-                ]
+                {"location": location, "count": count}
+                for location, count in locations.items()
+                if count and location and normalize(location) in places
             ]
-        } 
\ No newline at end of file
+        }
+
+    def _bucket_expression(self, bucket: str):
+        if self.db.get_bind().dialect.name == "sqlite":
+            return SQLITE_BUCKETS[bucket](Transaction.created_at)
+        return func.date_trunc(bucket, Transaction.created_at)
+
+    def stream_timeseries(
+        self,
+        start: datetime,
+        end: datetime,
+        bucket: str = "day",
+        group_by: Optional[str] = None,
+        output: str = "jsonl"
+    ) -> AsyncIterator[bytes]:
+        """Per-bucket transaction counts, completed quantity and success rate for
+        transactions created in [start, end), as JSON Lines or as an Arrow IPC stream
+        of record batches (columnar).
+
+        Rows are read from a server-side cursor in bucket order, and each format
+        sends them on as they arrive, at most one batch at a time. The generator owns the
+        session from here on and closes it when the stream ends.
+        """
+        bucket_column = self._bucket_expression(bucket).label("bucket")
+        completed = Transaction.status == TransactionStatus.COMPLETED.value
+        columns = [
+            bucket_column,
+            func.count(Transaction.id).label("transactions"),
+            func.coalesce(func.sum(case((completed, Transaction.quantity), else_=0)), 0).label("completed_quantity"),
+            func.sum(case((completed, 1), else_=0)).label("completed"),
+        ]
+        group_column = GROUP_COLUMNS.get(group_by)
+        if group_column is not None:
+            columns.insert(1, group_column.label("group"))
+
+        # created_at range first so the planner uses ix_transactions_created_at
+        query = select(*columns)\
+            .where(Transaction.created_at >= start, Transaction.created_at < end)
+        if group_column is not None:
+            query = query.join(Material, Material.id == Transaction.material_id)
+        group_by_columns = [bucket_column] if group_column is None else [bucket_column, group_column]
+        query = query.group_by(*group_by_columns)\
+            .order_by(*group_by_columns)\
+            .execution_options(yield_per=TIMESERIES_BATCH_SIZE)
+
+        async def rows():
+            async for row in await self.db.stream(query):
+                bucket_value = row.bucket if isinstance(row.bucket, str) else row.bucket.isoformat()
+                yield (
+                    bucket_value,
+                    row.group if group_column is not None else None,
+                    row.transactions,
+                    float(row.completed_quantity),
+                    round(success_rate(row.completed, row.transactions), 2),
+                )
+
+        async def jsonl() -> AsyncIterator[bytes]:
+            try:
+                async for bucket_value, group, count, quantity, rate in rows():
+                    record = {"bucket": bucket_value}
+                    if group_column is not None:
+                        record[group_by] = group
+                    record.update(transactions=count, completed_quantity=quantity, success_rate=rate)
+                    yield (json.dumps(record) + "\n").encode()
+            finally:
+                await self.db.close()
+
+        async def columnar() -> AsyncIterator[bytes]:
+            import pyarrow as pa
+
+            names = ["bucket", group_by, "transactions", "completed_quantity", "success_rate"]
+            types = [pa.string(), pa.string(), pa.int64(), pa.float64(), pa.float64()]
+            kept = [position for position, name in enumerate(names) if name]
+            schema = pa.schema([(names[position], types[position]) for position in kept])
+
+            def record_batch(batch: List[tuple]):
+                columns = list(zip(*batch))
+                return pa.RecordBatch.from_arrays(
+                    [pa.array(columns[position], type=types[position]) for position in kept],
+                    schema=schema
+                )
+
+            sink = ChunkSink()
+            try:
+                # Each TIMESERIES_BATCH_SIZE rows go out as one record batch
+                with pa.ipc.new_stream(sink, schema) as writer:
+                    batch = []
+                    async for values in rows():
+                        batch.append(values)
+                        if len(batch) == TIMESERIES_BATCH_SIZE:
+                            writer.write_batch(record_batch(batch))
+                            batch = []
+                            yield sink.drain()
+                    if batch:
+                        writer.write_batch(record_batch(batch))
+                yield sink.drain()
+            finally:
+                await self.db.close()
+
+        return jsonl() if output == "jsonl" else columnar()
@@ -1,38 +1,61 @@
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_session
 from app.models.models import User
-from app.core.security import verify_password
+from app.core.passwords import verify_and_update
+from app.core.rate_limit import check_login_rate
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
 
 class AuthService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, request: Request, db: AsyncSession = Depends(get_session)):
+        self.request = request
         self.db = db
 
     async def authenticate_user(self, email: str, password: str) -> User:
         try:
-            print(f"Attempting to authenticate user: {email}")  # Debug log
-            user = self.db.query(User).filter(User.email == email).first()
-            
+            logger.debug("Authenticating user", extra={"email": email})
+            check_login_rate(self.request, email)
+            user = await self.db.scalar(select(User).where(User.email == email))
+            # End the read so its connection goes back to the pool: far more logins
+            # can wait on the hash pool than there are connections
+            await self.db.commit()
+
+            # Unknown users are checked against a dummy hash so both failures take as long
+            verified, new_hash = await verify_and_update(password, user.hashed_password if user else None)
             if not user:
-                print(f"User not found: {email}")  # Debug log
+                logger.debug("Login for unknown user", extra={"email": email})
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect email or password"
                 )
             
-            if not verify_password(password, user.hashed_password):
-                print(f"Invalid password for user: {email}")  # Debug log
+            if not verified:
+                logger.debug("Login with invalid password", extra={"email": email})
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect email or password"
                 )
+
+            if new_hash:
+                # Stored with other cost settings; replace it now that the password is known
+                try:
+                    user.hashed_password = new_hash
+                    await self.db.commit()
+                except Exception:
+                    await self.db.rollback()
+                    logger.exception("Failed to rehash password", extra={"user_id": user.id})
             
-            print(f"Authentication successful for user: {email}")  # Debug log
+            logger.debug("Authenticated user", extra={"email": email})
             return user
             
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Authentication error: {str(e)}")  # Debug log
+            logger.exception("Authentication failed", extra={"email": email})
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=str(e)
-            ) 
\ No newline at end of file
+            ) 
@@ -0,0 +1,319 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
+from app.db.database import get_session
+from app.models.models import Material
+from app.schemas.bulk_schema import BulkImportResult, RowError
+from app.schemas.material import MaterialCreate
+from app.services import geohash
+from app.services.geo_service import gazetteer
+from app.services.rollup_service import ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, RollupDeltas
+from app.services.search_index import normalize, search_index, search_index_build
+from app.services.recommendation_index import recommendation_index, recommendation_index_build
+from app.core.cache import MATERIALS, invalidate
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+EXPORT_COLUMNS = [
+    Material.id,
+    Material.name,
+    Material.description,
+    Material.industry,
+    Material.quantity,
+    Material.unit,
+    Material.location,
+    Material.condition,
+    Material.status,
+    Material.owner_id,
+    Material.created_at,
+    Material.latitude,
+    Material.longitude,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+# A parsed upload row: (1-based data row number, fields, or an error for rows that did not parse)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+async def text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a UTF-8 byte stream into lines as it arrives, keeping the newlines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Rows of a CSV upload with a header row. Empty cells count as missing."""
+    header = None
+    number = 0
+    record = ""
+    async for line in text_lines(chunks):
+        # A quoted cell may span lines; the record is complete once its quotes balance
+        record += line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record]), []), ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        number += 1
+        yield number, {name: value for name, value in zip(header, values) if value != ""}, None
+    if record:
+        yield number + 1, None, "Unterminated quoted field"
+
+async def parse_jsonl(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Rows of a JSON Lines upload, one object per line"""
+    number = 0
+    async for line in text_lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, record, None
+
+def validation_messages(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    ]
+
+class BulkMaterialService:
+    def __init__(self, db: AsyncSession = Depends(get_session)):
+        self.db = db
+
+    async def import_materials(self, chunks: AsyncIterator[bytes], format: str, owner_id: int) -> BulkImportResult:
+        """Validate and insert listings from a CSV or JSON Lines stream.
+
+        Rows are validated one at a time and inserted IMPORT_BATCH_SIZE at a time
+        with a single executemany each, committed per batch. Invalid rows are
+        skipped and reported; the rest are imported.
+        """
+        result = BulkImportResult(inserted=0, failed=0, errors=[])
+        places = await self.db.run_sync(gazetteer.load)
+        rows = parse_csv(chunks) if format == "csv" else parse_jsonl(chunks)
+        batch: List[Tuple[int, MaterialCreate]] = []
+
+        async for number, record, error in rows:
+            if error is None:
+                try:
+                    batch.append((number, MaterialCreate.model_validate(record)))
+                except ValidationError as e:
+                    error = validation_messages(e)
+            if error is not None:
+                self._report(result, number, error if isinstance(error, list) else [error])
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await self._insert_batch(batch, owner_id, places, result)
+                batch = []
+        if batch:
+            await self._insert_batch(batch, owner_id, places, result)
+
+        if result.inserted:
+            await invalidate(MATERIALS)
+        logger.info("Bulk import finished", extra={
+            "owner_id": owner_id, "inserted": result.inserted, "failed": result.failed
+        })
+        return result
+
+    @staticmethod
+    def _report(result: BulkImportResult, number: int, errors: List[str]) -> None:
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(RowError(row=number, errors=errors))
+        else:
+            result.errors_truncated = True
+
+    async def _insert_batch(self, batch: List[Tuple[int, MaterialCreate]], owner_id: int,
+                            places: Dict[str, Tuple[float, float]], result: BulkImportResult) -> None:
+        now = datetime.utcnow()
+        values = []
+        for _, material in batch:
+            row = material.model_dump()
+            coordinates = places.get(normalize(material.location.strip())) if material.location else None
+            row.update(
+                owner_id=owner_id,
+                status="available",
+                created_at=now,
+                latitude=coordinates[0] if coordinates else None,
+                longitude=coordinates[1] if coordinates else None,
+                geohash=geohash.encode(*coordinates) if coordinates else None
+            )
+            values.append(row)
+
+        # Bulk inserts skip the flush hook that keeps the dashboard rollups current
+        deltas = RollupDeltas()
+        active = sum(1 for row in values if (row["quantity"] or 0) > 0)
+        if active:
+            deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, now, count=active)
+
+        try:
+            ids = (await self.db.execute(
+                insert(Material).returning(Material.id, sort_by_parameter_order=True),
+                values
+            )).scalars().all()
+            await self.db.run_sync(lambda session: deltas.write(session.connection()))
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.exception("Bulk insert failed", extra={"owner_id": owner_id, "rows": len(batch)})
+            for number, _ in batch:
+                self._report(result, number, [f"Could not be saved: {e}"])
+            return
+
+        result.inserted += len(ids)
+        search_index_build.apply(
+            search_index.add_many,
+            [(material_id, row["name"], row["description"], row["industry"]) for material_id, row in zip(ids, values)]
+        )
+        recommendation_index_build.apply(
+            recommendation_index.add_many,
+            [
+                (material_id, owner_id, row["name"], row["industry"], row["location"], row["quantity"],
+                 row["latitude"], row["longitude"])
+                for material_id, row in zip(ids, values)
+            ]
+        )
+
+    def export_materials(
+        self,
+        format: str = "csv",
+        owner_id: Optional[int] = None,
+        industry: Optional[str] = None,
+        location: Optional[str] = None,
+        condition: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Listings as CSV, JSON Lines or Parquet, read from a server-side cursor
+        and written EXPORT_BATCH_SIZE rows at a time. The generator owns the session
+        from here on and closes it when the stream ends.
+        """
+        query = select(*EXPORT_COLUMNS)
+        if owner_id is not None:
+            query = query.where(Material.owner_id == owner_id)
+        if industry:
+            query = query.where(Material.industry == industry)
+        if location:
+            query = query.where(Material.location == location)
+        if condition:
+            query = query.where(Material.condition == condition)
+        if status:
+            query = query.where(Material.status == status)
+        query = query.order_by(Material.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+        async def batches() -> AsyncIterator[List[tuple]]:
+            try:
+                batch = []
+                async for row in await self.db.stream(query):
+                    batch.append(tuple(row))
+                    if len(batch) >= EXPORT_BATCH_SIZE:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+            finally:
+                await self.db.close()
+
+        writers = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+        return writers[format](batches())
+
+async def write_csv(batches: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for batch in batches:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def write_jsonl(batches: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), default=datetime.isoformat) + "\n"
+            for row in batch
+        ).encode()
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain,
+    so a Parquet file can be streamed one row group at a time"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def write_parquet(batches: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("description", pa.string()),
+        ("industry", pa.string()),
+        ("quantity", pa.float64()),
+        ("unit", pa.string()),
+        ("location", pa.string()),
+        ("condition", pa.string()),
+        ("status", pa.string()),
+        ("owner_id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+    ])
+    sink = ChunkSink()
+    # One row group per batch, so memory stays at one batch however large the export
+    with pq.ParquetWriter(sink, schema) as writer:
+        async for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    yield sink.drain()
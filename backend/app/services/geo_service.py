@@ -0,0 +1,196 @@
+import math
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from app.db.database import get_session
+from app.models.models import Material, GazetteerEntry, has_postgis
+from app.schemas.geo_schema import NearbyMaterial
+from app.services import geohash
+from app.services.search_index import normalize
+
+# Seed rows for an empty gazetteer: (name, latitude, longitude)
+DEFAULT_PLACES = [
+    ("Tunis", 36.8065, 10.1815),
+    ("Ariana", 36.8625, 10.1956),
+    ("Manouba", 36.8081, 10.0972),
+    ("Ben Arous", 36.7531, 10.2189),
+    ("Megrine", 36.7686, 10.2336),
+    ("Rades", 36.7681, 10.2753),
+    ("Bir El Kassaa", 36.7394, 10.2097),
+    ("Fouchana", 36.6986, 10.1694),
+    ("El Mourouj", 36.7333, 10.2000),
+    ("Ezzahra", 36.7439, 10.3083),
+    ("Mohamedia", 36.6758, 10.1561),
+    ("Bizerte", 37.2744, 9.8739),
+    ("Nabeul", 36.4561, 10.7376),
+    ("Hammamet", 36.4000, 10.6167),
+    ("Zaghouan", 36.4029, 10.1429),
+    ("Beja", 36.7256, 9.1817),
+    ("Jendouba", 36.5011, 8.7803),
+    ("Le Kef", 36.1822, 8.7148),
+    ("Siliana", 36.0849, 9.3708),
+    ("Sousse", 35.8256, 10.6084),
+    ("Monastir", 35.7643, 10.8113),
+    ("Mahdia", 35.5047, 11.0622),
+    ("Kairouan", 35.6781, 10.0963),
+    ("Kasserine", 35.1676, 8.8365),
+    ("Sidi Bouzid", 35.0382, 9.4849),
+    ("Sfax", 34.7406, 10.7603),
+    ("Gafsa", 34.4250, 8.7842),
+    ("Gabes", 33.8815, 10.0982),
+    ("Medenine", 33.3549, 10.5055),
+    ("Djerba", 33.8759, 10.8575),
+    ("Tozeur", 33.9197, 8.1335),
+    ("Kebili", 33.7044, 8.9690),
+    ("Tataouine", 32.9297, 10.4518),
+]
+
+class Gazetteer:
+    """Process-wide cache of the gazetteer table; it is small and rarely changes"""
+
+    def __init__(self):
+        self._places: Optional[Dict[str, Tuple[float, float]]] = None
+
+    def load(self, db: Session) -> Dict[str, Tuple[float, float]]:
+        # No lock: under an AsyncSession this runs on the event loop via run_sync,
+        # where waiting on a lock held by another request's query deadlocks the
+        # loop. Concurrent first loads just read the table more than once.
+        places = self._places
+        if places is None:
+            entries = db.query(GazetteerEntry.name, GazetteerEntry.latitude, GazetteerEntry.longitude).all()
+            if not entries:
+                entries = self._seed(db)
+            places = self._places = {name: (lat, lon) for name, lat, lon in entries}
+        return places
+
+    def _seed(self, db: Session) -> List[Tuple[str, float, float]]:
+        try:
+            db.add_all([
+                GazetteerEntry(name=normalize(name), display_name=name, latitude=lat, longitude=lon)
+                for name, lat, lon in DEFAULT_PLACES
+            ])
+            db.commit()
+        except IntegrityError:
+            # Another request seeded it first
+            db.rollback()
+            return db.query(GazetteerEntry.name, GazetteerEntry.latitude, GazetteerEntry.longitude).all()
+        return [(normalize(name), lat, lon) for name, lat, lon in DEFAULT_PLACES]
+
+    def invalidate(self) -> None:
+        self._places = None
+
+gazetteer = Gazetteer()
+
+# Helpers on a sync Session, for scripts and for `await db.run_sync(...)` in async code
+
+def geocode(session: Session, location: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not location:
+        return None
+    return gazetteer.load(session).get(normalize(location.strip()))
+
+def known_locations(session: Session) -> Set[str]:
+    """Normalized names of every place in the gazetteer"""
+    return set(gazetteer.load(session))
+
+def apply_coordinates(session: Session, material: Material) -> None:
+    """Set latitude, longitude and geohash on a listing from its location"""
+    coordinates = geocode(session, material.location)
+    if coordinates is None:
+        material.latitude = material.longitude = material.geohash = None
+    else:
+        material.latitude, material.longitude = coordinates
+        material.geohash = geohash.encode(*coordinates)
+
+def backfill_coordinates(session: Session, batch_size: int = 1000) -> int:
+    """Geocode listings that have no coordinates yet; returns how many were updated"""
+    updated = 0
+    last_id = 0
+    while True:
+        batch = session.query(Material)\
+            .filter(Material.geohash.is_(None), Material.location.isnot(None), Material.id > last_id)\
+            .order_by(Material.id)\
+            .limit(batch_size)\
+            .all()
+        if not batch:
+            return updated
+        for material in batch:
+            apply_coordinates(session, material)
+            updated += material.geohash is not None
+        last_id = batch[-1].id
+        session.commit()
+
+class GeoService:
+    def __init__(self, db: AsyncSession = Depends(get_session)):
+        self.db = db
+
+    async def get_nearby_materials(self, latitude: float, longitude: float, radius_km: float, limit: int = 50) -> List[NearbyMaterial]:
+        """Listings within radius_km of a point, nearest first"""
+        if await self.db.run_sync(lambda session: has_postgis(session.connection())):
+            query = self._nearby_postgis(latitude, longitude, radius_km, limit)
+        else:
+            query = self._nearby_geohash(latitude, longitude, radius_km, limit)
+        rows = (await self.db.execute(query)).all()
+
+        results = []
+        for material in rows:
+            distance = geohash.haversine_km(latitude, longitude, material.latitude, material.longitude)
+            if distance <= radius_km:
+                results.append(NearbyMaterial(
+                    id=material.id,
+                    name=material.name,
+                    industry=material.industry,
+                    quantity=material.quantity,
+                    unit=material.unit,
+                    location=material.location,
+                    condition=material.condition,
+                    description=material.description,
+                    status=material.status or "available",
+                    owner_id=material.owner_id,
+                    latitude=material.latitude,
+                    longitude=material.longitude,
+                    distance_km=round(distance, 3)
+                ))
+        results.sort(key=lambda m: (m.distance_km, m.id))
+        return results
+
+    def _nearby_query(self):
+        return select(
+            Material.id,
+            Material.name,
+            Material.industry,
+            Material.quantity,
+            Material.unit,
+            Material.location,
+            Material.condition,
+            Material.description,
+            Material.status,
+            Material.owner_id,
+            Material.latitude,
+            Material.longitude
+        )
+
+    def _nearby_geohash(self, latitude: float, longitude: float, radius_km: float, limit: int):
+        # Each covering cell is a prefix, i.e. a range scan on the geohash index
+        cells = geohash.covering_cells(latitude, longitude, radius_km)
+        min_lat, min_lon, max_lat, max_lon = geohash.bounding_box(latitude, longitude, radius_km)
+        # Equirectangular distance is monotonic enough to rank a small area in SQL
+        lon_scale = math.cos(math.radians(latitude))
+        approx_distance = (Material.latitude - latitude) * (Material.latitude - latitude) + \
+            (Material.longitude - longitude) * lon_scale * (Material.longitude - longitude) * lon_scale
+        return self._nearby_query()\
+            .where(or_(*[and_(Material.geohash >= cell, Material.geohash < cell + "~") for cell in cells]))\
+            .where(Material.latitude.between(min_lat, max_lat), Material.longitude.between(min_lon, max_lon))\
+            .order_by(approx_distance, Material.id)\
+            .limit(limit)
+
+    def _nearby_postgis(self, latitude: float, longitude: float, radius_km: float, limit: int):
+        # Same expression as ix_materials_geography so the GiST index serves both the filter and the KNN sort
+        point = literal_column("(ST_MakePoint(materials.longitude, materials.latitude)::geography)")
+        origin = func.geography(func.ST_MakePoint(longitude, latitude))
+        return self._nearby_query()\
+            .where(func.ST_DWithin(point, origin, radius_km * 1000))\
+            .order_by(point.op("<->")(origin), Material.id)\
+            .limit(limit)
@@ -0,0 +1,89 @@
+import math
+from typing import List, Set, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# Upper bound on cells per proximity query; more cells means tighter candidate
+# sets but more index range scans in the OR
+MAX_COVER_CELLS = 32
+
+def encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(lat, lon) height and width of a geohash cell in degrees"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) enclosing the circle"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return (
+        max(latitude - dlat, -90.0),
+        max(longitude - dlon, -180.0),
+        min(latitude + dlat, 90.0),
+        min(longitude + dlon, 180.0),
+    )
+
+def _cells_for_box(box: Tuple[float, float, float, float], precision: int) -> Set[str]:
+    min_lat, min_lon, max_lat, max_lon = box
+    lat_step, lon_step = cell_size_degrees(precision)
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(encode(min(lat, max_lat), min(lon, max_lon), precision))
+            if lon >= max_lon:
+                break
+            lon += lon_step
+        if lat >= max_lat:
+            break
+        lat += lat_step
+    return cells
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """Geohash prefixes that together cover the circle, at the finest
+    precision that needs no more than MAX_COVER_CELLS cells"""
+    box = bounding_box(latitude, longitude, radius_km)
+    best = _cells_for_box(box, 1)
+    for precision in range(2, 10):
+        lat_step, lon_step = cell_size_degrees(precision)
+        estimate = (math.ceil((box[2] - box[0]) / lat_step) + 1) * (math.ceil((box[3] - box[1]) / lon_step) + 1)
+        if estimate > MAX_COVER_CELLS:
+            break
+        best = _cells_for_box(box, precision)
+    return sorted(best)
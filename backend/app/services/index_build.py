@@ -0,0 +1,57 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+class IndexBuild:
+    """Builds a per-process index from the database once, on first use.
+
+    Concurrent first requests wait on a single build. Writes that reach the
+    index while the build reads its snapshot are held and replayed once it
+    finishes, so a listing created or changed mid-build is neither missed nor
+    overwritten by its older snapshot row. Before any build, writes are
+    dropped: the build will read them from the database.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = asyncio.Lock()
+        self._deferred: Optional[List[Tuple[Callable, tuple]]] = None
+
+    def apply(self, write: Callable, *args) -> None:
+        """Call an index write method with args, as the build state allows"""
+        if self.index.built:
+            write(*args)
+        elif self._deferred is not None:
+            self._deferred.append((write, args))
+
+    async def ensure(self, load: Callable[[], Awaitable[None]]) -> None:
+        """Fill the index with `load` unless it is built already"""
+        if self.index.built:
+            return
+        async with self._lock:
+            if self.index.built:
+                return
+            self._deferred = []
+            try:
+                await load()
+                # No awaits from here on: nothing can slip between replay and built
+                for write, args in self._deferred:
+                    write(*args)
+                self.index.built = True
+            except BaseException:
+                self.index.clear()
+                raise
+            finally:
+                self._deferred = None
+
+async def load_batches(rows, add_many: Callable, batch_size: int) -> None:
+    """Feed streamed rows to add_many a batch at a time, yielding to the event
+    loop between batches so a large build does not stall other requests"""
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            add_many(batch)
+            batch = []
+            await asyncio.sleep(0)
+    if batch:
+        add_many(batch)
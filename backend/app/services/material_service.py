@@ -1,38 +1,159 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException
-from app.db.database import get_db
+from app.db.database import get_session
 from app.models.models import Material
 from app.schemas.material import MaterialResponse, MaterialCreate, MaterialUpdate
+from app.services.pagination import encode_cursor, keyset_before
+from app.services.search_index import search_index, search_index_build
+from app.services.recommendation_index import recommendation_index, recommendation_index_build
+from app.services.recommendation_service import index_material
+from app.services.geo_service import apply_coordinates
+from app.core.log import get_logger
+from app.services.notification_service import publish_material_event
+from app.core.cache import MATERIALS, invalidate
 from datetime import datetime
 
+logger = get_logger(__name__)
+
+MATERIAL_RESPONSE_FIELDS = tuple(MaterialResponse.model_fields)
+# Rows per round trip when streaming the whole catalog
+STREAM_BATCH_SIZE = 1000
+
+def backfill_created_at(db: Session, batch_size: int = 5000) -> int:
+    """Date listings saved without created_at, which the catalog's keyset cannot
+    page past, as the oldest dated listing so they stay at the end of the catalog.
+    Commits every `batch_size` rows; returns how many were updated."""
+    oldest = db.scalar(select(func.min(Material.created_at))) or datetime.utcnow()
+    updated = 0
+    while True:
+        batch = select(Material.id).where(Material.created_at.is_(None)).limit(batch_size).scalar_subquery()
+        count = db.execute(
+            update(Material).where(Material.id.in_(batch)).values(created_at=oldest)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        updated += count
+        if count < batch_size:
+            return updated
+
 class MaterialService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_session)):
         self.db = db
 
-    async def get_materials(self) -> List[MaterialResponse]:
+    @staticmethod
+    def _catalog_query(
+        industry: Optional[str] = None,
+        location: Optional[str] = None,
+        condition: Optional[str] = None,
+        status: Optional[str] = None,
+        min_quantity: Optional[float] = None,
+        max_quantity: Optional[float] = None,
+        cursor: Optional[str] = None
+    ):
+        """The catalog's columns and filters, newest first"""
+        query = select(
+            Material.id,
+            Material.name,
+            Material.industry,
+            Material.quantity,
+            Material.unit,
+            Material.location,
+            Material.condition,
+            Material.description,
+            Material.status,
+            Material.created_at,
+            Material.owner_id
+        )
+
+        if industry is not None:
+            query = query.where(Material.industry == industry)
+        if location is not None:
+            query = query.where(Material.location == location)
+        if condition is not None:
+            query = query.where(Material.condition == condition)
+        if status is not None:
+            query = query.where(Material.status == status)
+        if min_quantity is not None:
+            query = query.where(Material.quantity >= min_quantity)
+        if max_quantity is not None:
+            query = query.where(Material.quantity <= max_quantity)
+        if cursor:
+            query = query.where(keyset_before(Material.created_at, Material.id, cursor))
+        return query.order_by(Material.created_at.desc(), Material.id.desc())
+
+    @staticmethod
+    def _catalog_item(material) -> dict:
+        item = {
+            "id": material.id,
+            "name": material.name,
+            "industry": material.industry,
+            "quantity": material.quantity,
+            "unit": material.unit,
+            "location": material.location,
+            "condition": material.condition,
+            "description": material.description,
+            "status": material.status or "available",
+            "created_at": material.created_at,
+            "owner_id": material.owner_id
+        }
+        # Only what the response model declares, as its validation would have kept
+        return {field: item[field] for field in MATERIAL_RESPONSE_FIELDS if field in item}
+
+    async def get_materials(
+        self,
+        industry: Optional[str] = None,
+        location: Optional[str] = None,
+        condition: Optional[str] = None,
+        status: Optional[str] = None,
+        min_quantity: Optional[float] = None,
+        max_quantity: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
+        """Get one page of the catalog, newest first, using a (created_at, id) keyset cursor.
+        Rows are plain dicts in MaterialResponse's shape, for json_response."""
         try:
-            materials = self.db.query(Material).all()
-            return [
-                MaterialResponse(
-                    id=material.id,
-                    name=material.name,
-                    industry=material.industry,
-                    quantity=material.quantity,
-                    unit=material.unit,
-                    location=material.location,
-                    condition=material.condition,
-                    description=material.description,
-                    status=material.status or "available",
-                    created_at=material.created_at or datetime.utcnow(),
-                    owner_id=material.owner_id
-                )
-                for material in materials
-            ]
+            # Fetch one extra row to know whether another page exists
+            query = self._catalog_query(industry, location, condition, status, min_quantity, max_quantity, cursor)\
+                .limit(limit + 1)
+            rows = (await self.db.execute(query)).all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+            return {"items": [self._catalog_item(row) for row in rows], "next_cursor": next_cursor}
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Error in get_materials service: {e}")
+            logger.exception("Failed to list materials")
             raise e
 
+    async def stream_materials(
+        self,
+        industry: Optional[str] = None,
+        location: Optional[str] = None,
+        condition: Optional[str] = None,
+        status: Optional[str] = None,
+        min_quantity: Optional[float] = None,
+        max_quantity: Optional[float] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """The whole catalog from `cursor` on, in get_materials' order and item shape,
+        read from a server-side cursor STREAM_BATCH_SIZE rows at a time. The
+        generator owns the session and closes it when the stream ends."""
+        query = self._catalog_query(industry, location, condition, status, min_quantity, max_quantity, cursor)\
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        try:
+            async for row in await self.db.stream(query):
+                yield self._catalog_item(row)
+        finally:
+            await self.db.close()
+
     async def create_material(self, material_data: MaterialCreate, owner_id: int) -> MaterialResponse:
         try:
             new_material = Material(
@@ -40,18 +161,25 @@ class MaterialService:
                 owner_id=owner_id,
                 created_at=datetime.utcnow()
             )
+            await self.db.run_sync(apply_coordinates, new_material)
             self.db.add(new_material)
-            self.db.commit()
-            self.db.refresh(new_material)
+            await self.db.commit()
+            await invalidate(MATERIALS)
+            await self.db.refresh(new_material)
+            search_index_build.apply(
+                search_index.add, new_material.id, new_material.name, new_material.description, new_material.industry
+            )
+            index_material(new_material)
+            await publish_material_event("created", new_material.id)
             return MaterialResponse.model_validate(new_material)
         except Exception as e:
-            self.db.rollback()
-            print(f"Error creating material: {e}")
+            await self.db.rollback()
+            logger.exception("Failed to create material", extra={"owner_id": owner_id})
             raise HTTPException(status_code=500, detail=str(e))
 
     async def delete_material(self, material_id: int, user_id: int) -> None:
         try:
-            material = self.db.query(Material).filter(Material.id == material_id).first()
+            material = await self.db.get(Material, material_id)
             if not material:
                 raise HTTPException(status_code=404, detail="Material not found")
             
@@ -59,33 +187,50 @@ class MaterialService:
             if material.owner_id != user_id:
                 raise HTTPException(status_code=403, detail="Not authorized to delete this material")
 
-            self.db.delete(material)
-            self.db.commit()
+            await self.db.delete(material)
+            await self.db.commit()
+            await invalidate(MATERIALS)
+            search_index_build.apply(search_index.remove, material_id)
+            recommendation_index_build.apply(recommendation_index.remove, material_id)
+            await publish_material_event("deleted", material_id)
         except Exception as e:
-            self.db.rollback()
-            print(f"Error deleting material: {e}")
+            await self.db.rollback()
+            logger.exception("Failed to delete material", extra={"material_id": material_id})
             raise HTTPException(status_code=500, detail=str(e))
 
     async def get_material(self, material_id: int) -> Material:
-        material = self.db.query(Material).filter(Material.id == material_id).first()
+        material = await self.db.get(Material, material_id)
         return material 
 
     async def update_material(self, material_id: int, material_update: MaterialUpdate) -> MaterialResponse:
         try:
-            material = self.db.query(Material).filter(Material.id == material_id).first()
+            material = await self.db.get(Material, material_id)
             if not material:
                 raise HTTPException(status_code=404, detail="Material not found")
 
             # Update only provided fields
             update_data = material_update.model_dump(exclude_unset=True)
+            if update_data.get("quantity") is not None and update_data["quantity"] < material.reserved:
+                raise HTTPException(status_code=409, detail="Quantity is below the amount held by open transactions")
             for field, value in update_data.items():
                 setattr(material, field, value)
+            if "location" in update_data:
+                await self.db.run_sync(apply_coordinates, material)
 
-            self.db.commit()
-            self.db.refresh(material)
+            await self.db.commit()
+            await invalidate(MATERIALS)
+            await self.db.refresh(material)
+            search_index_build.apply(
+                search_index.add, material.id, material.name, material.description, material.industry
+            )
+            index_material(material)
+            await publish_material_event("updated", material.id)
             
             return MaterialResponse.model_validate(material)
+        except HTTPException:
+            await self.db.rollback()
+            raise
         except Exception as e:
-            self.db.rollback()
-            print(f"Error updating material: {e}")
+            await self.db.rollback()
+            logger.exception("Failed to update material", extra={"material_id": material_id})
             raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
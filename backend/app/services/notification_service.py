@@ -1,17 +1,289 @@
-from typing import List
+import secrets
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+from sqlalchemy import delete, false, func, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi import Depends
-from app.db.database import get_db
+from fastapi import Depends, HTTPException
+from app.db.database import get_session
 from app.models.models import Notification
 from app.schemas.notification_schema import NotificationCreate, Notification as NotificationSchema
+from app.schemas.pagination import Page
+from app.services.pagination import encode_cursor, keyset_before
+from app.services.outbox import consumer
+from app.core.bus import bus
+from app.core.cache import CACHE_PREFIX, cache_backend
+from app.core.counters import add_to_counter, counter_key, read_counter, reset_counter
+from app.core.lru import LRUCache
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Channels: one per user for their notifications, one shared for listing changes
+MATERIALS_CHANNEL = "materials"
+# Notifications replayed per query when a stream resumes
+REPLAY_BATCH_SIZE = 500
+# Seconds between keepalives on an idle stream, so proxies keep it open
+KEEPALIVE_SECONDS = 15
+# Seconds a WebSocket ticket stays redeemable
+TICKET_TTL = 30
+# Rows per round trip when streaming a user's whole notification list
+STREAM_BATCH_SIZE = 1000
+
+# Tickets when no shared cache is configured; they only redeem on this worker
+_local_tickets = LRUCache(maxsize=10000)
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def unread_key(user_id: int) -> str:
+    return counter_key("unread", user_id)
+
+def notification_event(notification: Notification) -> dict:
+    return {
+        "event": "notification",
+        "id": notification.id,
+        "data": NotificationSchema.model_validate(notification).model_dump(mode="json")
+    }
+
+async def publish_notifications(notifications: Iterable[Notification]) -> None:
+    """Count committed notifications as unread and push them to their users'
+    open streams"""
+    for notification in notifications:
+        await add_to_counter(unread_key(notification.user_id), 1)
+        await bus.publish(user_channel(notification.user_id), notification_event(notification))
+
+@consumer("notifications", "transaction.created", "transaction.status_changed", "transaction.completed")
+async def notify_transaction_party(db: AsyncSession, topic: str, event: dict):
+    """Store the notification for the party that did not act, and push it to their
+    streams once the outbox worker commits it"""
+    if topic == "transaction.created":
+        notification = Notification(
+            title="New Transaction Request",
+            type="transaction",
+            message=f"Transaction #{event['transaction_id']} requests {event['quantity']} of {event['material_name']}",
+            user_id=event["to_owner_id"]
+        )
+    elif topic == "transaction.completed":
+        notification = Notification(
+            title="Transaction Completed",
+            type="transaction",
+            message=f"Transaction #{event['transaction_id']} has been completed",
+            user_id=event["from_owner_id"]
+        )
+    else:
+        notification = Notification(
+            title=f"Transaction {event['status'].capitalize()}",
+            type="transaction",
+            message=f"Transaction #{event['transaction_id']} for {event['material_name']} was {event['status']}",
+            user_id=event["to_owner_id"] if event["actor_id"] == event["from_owner_id"] else event["from_owner_id"]
+        )
+    notification.read = False
+    notification.created_at = datetime.utcnow()
+    db.add(notification)
+    return lambda: publish_notifications([notification])
+
+async def publish_material_event(action: str, material_id: int) -> None:
+    """Tell open streams that a listing changed. These are not stored, so a
+    stream that reconnects does not get the ones it missed."""
+    await bus.publish(MATERIALS_CHANNEL, {"event": "material", "data": {"action": action, "id": material_id}})
+
+async def issue_stream_ticket(user_id: int) -> str:
+    """A short-lived, single-use ticket for opening the notification WebSocket,
+    which browsers cannot send an Authorization header on"""
+    ticket = secrets.token_urlsafe(24)
+    backend = cache_backend()
+    if backend is not None:
+        await backend.set(f"{CACHE_PREFIX}:ticket:{ticket}", str(user_id).encode(), expire=TICKET_TTL)
+    else:
+        _local_tickets.set(ticket, user_id, ttl=TICKET_TTL)
+    return ticket
+
+async def redeem_stream_ticket(ticket: str) -> Optional[int]:
+    backend = cache_backend()
+    if backend is None:
+        user_id = _local_tickets.get(ticket)
+        _local_tickets.pop(ticket)
+        return user_id
+    key = f"{CACHE_PREFIX}:ticket:{ticket}"
+    user_id = await backend.get(key)
+    if user_id is None or not await backend.clear(key=key):
+        # Already redeemed, possibly by a concurrent request
+        return None
+    return int(user_id)
 
 class NotificationService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_session)):
         self.db = db
 
-    async def get_user_notifications(self, user_id: int) -> List[NotificationSchema]:
-        notifications = self.db.query(Notification)\
-            .filter(Notification.user_id == user_id)\
-            .order_by(Notification.created_at.desc())\
-            .all()
-        return [NotificationSchema.from_orm(n) for n in notifications]
+    async def get_user_notifications(
+        self,
+        user_id: int,
+        read: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Page[NotificationSchema]:
+        """One keyset page of the user's notifications, newest first"""
+        notifications = (await self.db.scalars(
+            self._notifications_query(user_id, read, cursor).limit(limit + 1)
+        )).all()
+
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = encode_cursor(notifications[-1].created_at, notifications[-1].id)
+        return Page[NotificationSchema](
+            items=[NotificationSchema.model_validate(n) for n in notifications],
+            next_cursor=next_cursor
+        )
+
+    async def stream_user_notifications(
+        self,
+        user_id: int,
+        read: Optional[bool] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """All of the user's notifications from `cursor` on, in get_user_notifications'
+        order, read from a server-side cursor STREAM_BATCH_SIZE rows at a time. The
+        generator owns the session and closes it when the stream ends."""
+        query = self._notifications_query(user_id, read, cursor)\
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        try:
+            async for (notification,) in await self.db.stream(query):
+                yield NotificationSchema.model_validate(notification).model_dump(mode="json")
+        finally:
+            await self.db.close()
+
+    @staticmethod
+    def _notifications_query(user_id: int, read: Optional[bool], cursor: Optional[str]):
+        query = select(Notification).where(Notification.user_id == user_id)
+        if read is not None:
+            query = query.where(Notification.read == read)
+        if cursor:
+            query = query.where(keyset_before(Notification.created_at, Notification.id, cursor))
+        return query.order_by(Notification.created_at.desc(), Notification.id.desc())
+
+    async def mark_as_read(self, notification_id: int, user_id: int) -> dict:
+        try:
+            result = await self.db.execute(
+                update(Notification)
+                .where(Notification.id == notification_id, Notification.user_id == user_id, Notification.read == false())
+                .values(read=True)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                exists = await self.db.scalar(
+                    select(Notification.id).where(Notification.id == notification_id, Notification.user_id == user_id)
+                )
+                if exists is None:
+                    raise HTTPException(status_code=404, detail="Notification not found")
+            await self.db.commit()
+        except HTTPException:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.exception("Failed to mark notification read", extra={"notification_id": notification_id})
+            raise HTTPException(status_code=500, detail=str(e))
+        if result.rowcount:
+            await add_to_counter(unread_key(user_id), -result.rowcount)
+        return {"updated": result.rowcount}
+
+    async def mark_all_as_read(self, user_id: int) -> dict:
+        try:
+            result = await self.db.execute(
+                update(Notification)
+                .where(Notification.user_id == user_id, Notification.read == false())
+                .values(read=True)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.exception("Failed to mark notifications read", extra={"user_id": user_id})
+            raise HTTPException(status_code=500, detail=str(e))
+        if result.rowcount:
+            await add_to_counter(unread_key(user_id), -result.rowcount)
+        return {"updated": result.rowcount}
+
+    async def clear_all(self, user_id: int) -> dict:
+        try:
+            result = await self.db.execute(
+                delete(Notification)
+                .where(Notification.user_id == user_id)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.exception("Failed to clear notifications", extra={"user_id": user_id})
+            raise HTTPException(status_code=500, detail=str(e))
+        if result.rowcount:
+            await reset_counter(unread_key(user_id))
+        return {"deleted": result.rowcount}
+
+    async def get_unread_count(self, user_id: int) -> dict:
+        """Read from the user's unread counter, which new notifications and reads
+        move; only a missing counter is counted, from the (user_id, read, ...) index"""
+        count = await read_counter(unread_key(user_id), lambda: self.db.scalar(
+            select(func.count())
+            .select_from(Notification)
+            .where(Notification.user_id == user_id, Notification.read == false())
+        ))
+        return {"count": count}
+
+    async def stream(self, user_id: int, last_id: Optional[int] = None) -> AsyncIterator[Optional[dict]]:
+        """Events for a user's notification stream: first the notifications after
+        `last_id` from the database, then live ones from the bus. Yields None when
+        the stream has been idle for KEEPALIVE_SECONDS. Ends if the client falls
+        too far behind; it can reconnect with the last id it received.
+
+        The generator owns the session; it is released once the backlog is read.
+        """
+        async with bus.subscribe(user_channel(user_id), MATERIALS_CHANNEL) as subscription:
+            # Subscribed before reading the backlog, so nothing committed in between
+            # is missed; live events the backlog already covered are dropped by id
+            try:
+                while last_id is not None:
+                    backlog = (await self.db.scalars(
+                        select(Notification)
+                        .where(Notification.user_id == user_id, Notification.id > last_id)
+                        .order_by(Notification.id)
+                        .limit(REPLAY_BATCH_SIZE)
+                    )).all()
+                    for notification in backlog:
+                        yield notification_event(notification)
+                        last_id = notification.id
+                    if len(backlog) < REPLAY_BATCH_SIZE:
+                        break
+            finally:
+                await self.db.close()
+
+            # Only the backlog's high-water mark: outbox workers publish in parallel,
+            # so live ids can arrive out of order and must not raise it
+            replayed_up_to = last_id or 0
+            while True:
+                try:
+                    event = await subscription.get(KEEPALIVE_SECONDS)
+                except OverflowError:
+                    return
+                if event is not None and "id" in event and event["id"] <= replayed_up_to:
+                    continue
+                yield event
+
+def prune_read_notifications(db: Session, older_than: datetime, batch_size: int = 5000) -> int:
+    """Delete read notifications created before `older_than`, committing every
+    `batch_size` rows so no single transaction holds locks over the whole range.
+    Only read ones go, so unread counters stay as they are."""
+    deleted = 0
+    while True:
+        batch = select(Notification.id).where(
+            Notification.read == true(),
+            Notification.created_at < older_than
+        ).limit(batch_size).scalar_subquery()
+        count = db.execute(
+            delete(Notification).where(Notification.id.in_(batch)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import random
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import delete, false, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from prometheus_client import Counter, Histogram
+from app.db.database import get_session
+from app.models.models import OutboxEvent
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Run the worker inside each app process; turn off when outbox_worker.py runs it instead
+OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "true").lower() in ("1", "true", "yes")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+# Seconds between polls when idle; writes in this process wake the worker sooner
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Seconds a claimed batch is reserved; a worker that dies mid-batch releases it after this
+CLAIM_SECONDS = 60
+MAX_RETRY_DELAY = 300
+
+OUTBOX_EVENTS = Counter("outbox_events_total", "Outbox deliveries by outcome", ["topic", "result"])
+OUTBOX_LAG = Histogram(
+    "outbox_delivery_lag_seconds",
+    "Time from the write to every consumer having handled its event",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60, 300, 3600)
+)
+
+# A consumer stages its database changes on the worker's session, which commits
+# them together with the delivery record. Anything that must wait for that
+# commit, like publishing to open streams, goes in the callback it returns.
+AfterCommit = Callable[[], Awaitable[None]]
+Handler = Callable[[AsyncSession, str, dict], Awaitable[Optional[AfterCommit]]]
+
+_consumers: Dict[str, Dict[str, Handler]] = defaultdict(dict)
+
+def consumer(name: str, *topics: str):
+    """Register a handler for these topics. Delivery is at least once and each
+    consumer is retried on its own, so a failing webhook never repeats a
+    notification that was already stored."""
+    def decorator(handler: Handler) -> Handler:
+        for topic in topics:
+            _consumers[topic][name] = handler
+        return handler
+    return decorator
+
+def enqueue(db, topic: str, payload: dict) -> None:
+    """Record an event in the caller's transaction; it is delivered once that commits"""
+    now = datetime.utcnow()
+    db.add(OutboxEvent(topic=topic, payload=payload, created_at=now, available_at=now))
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with full jitter"""
+    return timedelta(seconds=random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempts)))
+
+session_scope = asynccontextmanager(get_session)
+
+class OutboxWorker:
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        """Look for new events now rather than at the next poll"""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        logger.info("Outbox worker started", extra={"consumers": {topic: list(c) for topic, c in _consumers.items()}})
+        while True:
+            try:
+                processed = await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox batch failed")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def drain(self) -> int:
+        """Claim and deliver one batch of due events. Returns how many were claimed."""
+        async with session_scope() as db:
+            events = await self._claim(db)
+            for event in events:
+                await self._deliver(db, event)
+        return len(events)
+
+    async def _claim(self, db: AsyncSession) -> list:
+        now = datetime.utcnow()
+        events = (await db.execute(
+            select(
+                OutboxEvent.id,
+                OutboxEvent.topic,
+                OutboxEvent.payload,
+                OutboxEvent.created_at,
+                OutboxEvent.attempts,
+                OutboxEvent.delivered_to
+            )
+            .where(OutboxEvent.failed == false(), OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            # Concurrent workers on PostgreSQL take disjoint batches
+            .with_for_update(skip_locked=True)
+        )).all()
+        if events:
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_([event.id for event in events]))
+                .values(available_at=now + timedelta(seconds=CLAIM_SECONDS), attempts=OutboxEvent.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        return events
+
+    async def _deliver(self, db: AsyncSession, event) -> None:
+        attempts = event.attempts + 1
+        delivered_to = list(event.delivered_to or [])
+        error = None
+        for name, handler in _consumers.get(event.topic, {}).items():
+            if name in delivered_to:
+                continue
+            try:
+                after_commit = await handler(db, event.topic, event.payload)
+                delivered_to.append(name)
+                await db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event.id)
+                    .values(delivered_to=delivered_to)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                error = f"{name}: {e!r}"
+                logger.warning("Outbox consumer failed", exc_info=True, extra={
+                    "event_id": event.id, "topic": event.topic, "consumer": name, "attempts": attempts
+                })
+                continue
+            if after_commit is not None:
+                try:
+                    await after_commit()
+                except Exception:
+                    logger.warning("Outbox after-commit step failed", exc_info=True, extra={"event_id": event.id})
+
+        if error is None:
+            await db.execute(delete(OutboxEvent).where(OutboxEvent.id == event.id))
+            OUTBOX_EVENTS.labels(event.topic, "delivered").inc()
+            OUTBOX_LAG.observe((datetime.utcnow() - event.created_at).total_seconds())
+        else:
+            failed = attempts >= OUTBOX_MAX_ATTEMPTS
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id == event.id)
+                .values(
+                    available_at=datetime.utcnow() + retry_delay(attempts),
+                    last_error=error[:2000],
+                    failed=failed
+                )
+                .execution_options(synchronize_session=False)
+            )
+            OUTBOX_EVENTS.labels(event.topic, "failed" if failed else "retried").inc()
+            if failed:
+                logger.error("Outbox event gave up", extra={"event_id": event.id, "topic": event.topic, "error": error})
+        await db.commit()
+
+worker = OutboxWorker()
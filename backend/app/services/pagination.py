@@ -0,0 +1,24 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the (created_at, id) position of the last row of a page"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_before(created_at_column, id_column, cursor: str):
+    """Filter for rows strictly after the cursor when ordering by (created_at, id) descending"""
+    created_at, row_id = decode_cursor(cursor)
+    return tuple_(created_at_column, id_column) < tuple_(created_at, row_id)
@@ -0,0 +1,468 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.geohash import EARTH_RADIUS_KM
+from app.services.index_build import IndexBuild
+from app.services.search_index import normalize, tokenize
+
+# How much each signal can add to a listing's score; the preference signals
+# are normalized to [0, 1] first
+SIGNAL_WEIGHTS = {
+    "industry": 3.0,
+    "name": 2.0,
+    "location": 1.0,
+    "proximity": 1.5,
+    "quantity": 1.0,
+    "freshness": 0.5,
+}
+# Distance at which the proximity signal has dropped to half
+PROXIMITY_KM = 50.0
+# Name terms kept per listing
+NAME_TERMS = 4
+
+# Column name -> (dtype, shape of one row's entry)
+LISTING_COLUMNS = {
+    "ids": (np.int64, ()),
+    "owners": (np.int64, ()),
+    "live": (np.bool_, ()),
+    "cell": (np.int32, ()),
+    "slot": (np.int64, ()),  # position in the cell's row list
+    "name_terms": (np.int32, (NAME_TERMS,)),
+    "quantity": (np.float32, ()),
+    # Unit vector, zero when not geocoded. Double precision: nearby points differ
+    # in the seventh digit, which float32 would round away.
+    "position": (np.float64, (3,)),
+}
+# Per cell, bounds on its listings' signals. They only ever widen, so they stay
+# valid as listings change or leave without rescanning the cell.
+CELL_COLUMNS = {
+    "industry": (np.int32, ()),
+    "location": (np.int32, ()),
+    "count": (np.int64, ()),
+    "centroid": (np.float64, (3,)),
+    "radius": (np.float64, ()),  # farthest listing from the centroid, as a chord
+    "max_quantity": (np.float32, ()),
+    "max_id": (np.int64, ()),
+}
+
+def unit_vector(latitude: float, longitude: float) -> np.ndarray:
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+
+def proximity(chord_sq):
+    """Proximity signal from the squared chord length between unit vectors"""
+    return SIGNAL_WEIGHTS["proximity"] / (1.0 + chord_sq * (EARTH_RADIUS_KM / PROXIMITY_KM) ** 2)
+
+class Columns:
+    """Column arrays that share a row count and grow together"""
+
+    def __init__(self, spec: Dict[str, tuple], capacity: int):
+        self.spec = spec
+        self.capacity = capacity
+        for name, (dtype, shape) in spec.items():
+            setattr(self, name, np.zeros((capacity, *shape), dtype=dtype))
+
+    def reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+        self.capacity = max(size, 2 * self.capacity)
+        for name, (dtype, shape) in self.spec.items():
+            current = getattr(self, name)
+            resized = np.zeros((self.capacity, *shape), dtype=dtype)
+            resized[:len(current)] = current
+            setattr(self, name, resized)
+
+class Vocabulary:
+    """Dense integer codes for a categorical feature; 0 means missing or unknown"""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._codes) + 1
+
+    def code(self, value: Optional[str]) -> int:
+        if not value:
+            return 0
+        return self._codes.setdefault(value, len(self._codes) + 1)
+
+    def lookup(self, value: str) -> int:
+        return self._codes.get(value, 0)
+
+class BuyerProfile:
+    """What a buyer has asked for before. Each past request adds its weight to
+    the listing's industry, location and name terms; quantity and origin are
+    weighted averages."""
+
+    def __init__(self):
+        self.industries: Dict[str, float] = defaultdict(float)
+        self.locations: Dict[str, float] = defaultdict(float)
+        self.terms: Dict[str, float] = defaultdict(float)
+        self._quantity = 0.0
+        self._quantity_weight = 0.0
+        self._position = np.zeros(3)
+        self._origin: Optional[np.ndarray] = None
+
+    def add(self, weight: float, name: Optional[str], industry: Optional[str], location: Optional[str],
+            quantity: Optional[float], latitude: Optional[float], longitude: Optional[float]) -> None:
+        if industry:
+            self.industries[normalize(industry)] += weight
+        if location:
+            self.locations[normalize(location.strip())] += weight
+        for term in set(tokenize(name)):
+            self.terms[term] += weight
+        if quantity:
+            self._quantity += weight * quantity
+            self._quantity_weight += weight
+        if latitude is not None and longitude is not None:
+            self._position += weight * unit_vector(latitude, longitude)
+
+    def set_origin(self, latitude: float, longitude: float) -> None:
+        """Measure proximity from this point instead of where past requests were listed"""
+        self._origin = unit_vector(latitude, longitude)
+
+    @property
+    def origin(self) -> Optional[np.ndarray]:
+        """Where the buyer sources from, as a unit vector"""
+        if self._origin is not None:
+            return self._origin
+        norm = np.linalg.norm(self._position)
+        return self._position / norm if norm else None
+
+    @property
+    def quantity(self) -> Optional[float]:
+        """Typical requested quantity"""
+        return self._quantity / self._quantity_weight if self._quantity_weight else None
+
+class MaterialFeatureIndex:
+    """Open listings as column arrays, scored against a buyer profile with NumPy.
+
+    Each listing is a row: name term codes, quantity, and position as a unit
+    vector so distance to the buyer is a dot product. Rows are grouped into
+    cells by (industry, location), and each cell keeps upper bounds on what
+    its listings can score. A query ranks the cells by bound, scores whole
+    cells in one vectorized pass each, and stops once no remaining cell can
+    beat the current k-th best, so a buyer with a history reads the few
+    cells that match it instead of the catalog. Rows are written as listings
+    are created or change and reused when they close.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._reset(capacity)
+
+    def _reset(self, capacity: int) -> None:
+        self.industries = Vocabulary()
+        self.locations = Vocabulary()
+        self.terms = Vocabulary()
+        self._term_counts: Dict[int, int] = defaultdict(int)
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._max_id = 0
+        self.listings = Columns(LISTING_COLUMNS, capacity)
+        self.cells = Columns(CELL_COLUMNS, 64)
+        self._cell_ids: Dict[Tuple[int, int], int] = {}
+        # Row numbers per cell, appended to as listings arrive. Entries left by
+        # listings that moved or closed are skipped until the list is compacted.
+        self._cell_rows: List[np.ndarray] = []
+        self._cell_fill: List[int] = []
+        self._cell_stale: List[int] = []
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, material_id: int, owner_id: Optional[int], name: Optional[str], industry: Optional[str],
+            location: Optional[str], quantity: Optional[float], latitude: Optional[float],
+            longitude: Optional[float]) -> None:
+        """Index a listing, replacing any previous version of it; one with nothing left is removed"""
+        if not quantity or quantity <= 0:
+            self.remove(material_id)
+            return
+        listings = self.listings
+        with self._lock:
+            row = self._rows.get(material_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = self._size
+                    self._size += 1
+                    listings.reserve(self._size)
+                self._rows[material_id] = row
+                old_cell = None
+            else:
+                old_cell = int(listings.cell[row])
+                self._release_terms(row)
+
+            terms = [self.terms.code(term) for term in dict.fromkeys(tokenize(name))][:NAME_TERMS]
+            for code in terms:
+                self._term_counts[code] += 1
+            listings.ids[row] = material_id
+            listings.owners[row] = owner_id or 0
+            listings.live[row] = True
+            listings.name_terms[row] = terms + [0] * (NAME_TERMS - len(terms))
+            listings.quantity[row] = quantity
+            has_position = latitude is not None and longitude is not None
+            listings.position[row] = unit_vector(latitude, longitude) if has_position else 0
+            self._max_id = max(self._max_id, material_id)
+
+            cell = self._cell(
+                self.industries.code(normalize(industry) if industry else None),
+                self.locations.code(normalize(location.strip()) if location else None),
+                listings.position[row]
+            )
+            if cell != old_cell:
+                self._join_cell(cell, row)
+                if old_cell is not None:
+                    self._leave_cell(old_cell)
+            cells = self.cells
+            cells.radius[cell] = max(cells.radius[cell], np.linalg.norm(listings.position[row] - cells.centroid[cell]))
+            cells.max_quantity[cell] = max(cells.max_quantity[cell], quantity)
+            cells.max_id[cell] = max(cells.max_id[cell], material_id)
+
+    def add_many(self, rows: Iterable[Tuple], batch_size: int = 5000) -> None:
+        """Index many listings, in the same shape as add. New listings are
+        written a batch at a time with whole-column assignments; ones already
+        indexed or without stock go through add."""
+        batch, pending = [], []
+        for row in rows:
+            if row[0] in self._rows or not row[5] or row[5] <= 0:
+                pending.append(row)
+            else:
+                batch.append(row)
+            if len(batch) == batch_size:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+        for row in pending:
+            self.add(*row)
+
+    def _insert(self, batch: List[Tuple]) -> None:
+        """Write listings the index does not hold yet"""
+        if len(set(row[0] for row in batch)) < len(batch):
+            for row in batch:
+                self.add(*row)
+            return
+        n = len(batch)
+        ids = np.fromiter((row[0] for row in batch), dtype=np.int64, count=n)
+        owners = np.fromiter((row[1] or 0 for row in batch), dtype=np.int64, count=n)
+        quantity = np.fromiter((row[5] for row in batch), dtype=np.float32, count=n)
+        latitude = np.array([np.nan if row[6] is None else row[6] for row in batch], dtype=np.float64)
+        longitude = np.array([np.nan if row[7] is None else row[7] for row in batch], dtype=np.float64)
+        lat, lon = np.radians(latitude), np.radians(longitude)
+        position = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+        position[np.isnan(latitude) | np.isnan(longitude)] = 0
+
+        listings = self.listings
+        with self._lock:
+            name_terms = np.zeros((n, NAME_TERMS), dtype=np.int32)
+            cell = np.empty(n, dtype=np.int32)
+            # Names, industries and places repeat across a catalog; normalize each once
+            names: Dict[Optional[str], List[int]] = {}
+            cell_keys: Dict[Tuple[Optional[str], Optional[str]], Tuple[int, int]] = {}
+            for i, (_, _, name, industry, location, *_rest) in enumerate(batch):
+                terms = names.get(name)
+                if terms is None:
+                    terms = names[name] = [self.terms.code(term) for term in dict.fromkeys(tokenize(name))][:NAME_TERMS]
+                for code in terms:
+                    self._term_counts[code] += 1
+                name_terms[i, :len(terms)] = terms
+                key = cell_keys.get((industry, location))
+                if key is None:
+                    key = cell_keys[(industry, location)] = (
+                        self.industries.code(normalize(industry) if industry else None),
+                        self.locations.code(normalize(location.strip()) if location else None)
+                    )
+                cell[i] = self._cell(*key, position[i])
+
+            reused = self._free[-n:][::-1] if self._free else []
+            del self._free[len(self._free) - len(reused):]
+            fresh = np.arange(self._size, self._size + n - len(reused))
+            self._size += len(fresh)
+            listings.reserve(self._size)
+            rows = np.concatenate([np.array(reused, dtype=np.int64), fresh])
+            self._rows.update(zip(ids.tolist(), rows.tolist()))
+            self._max_id = max(self._max_id, int(ids.max()))
+
+            listings.ids[rows] = ids
+            listings.owners[rows] = owners
+            listings.live[rows] = True
+            listings.name_terms[rows] = name_terms
+            listings.quantity[rows] = quantity
+            listings.position[rows] = position
+            listings.cell[rows] = cell
+
+            cells = self.cells
+            order = np.argsort(cell, kind="stable")
+            groups, starts = np.unique(cell[order], return_index=True)
+            for c, members in zip(groups.tolist(), np.split(order, starts[1:])):
+                fill = self._cell_fill[c]
+                cell_rows = self._cell_rows[c]
+                if fill + len(members) > len(cell_rows):
+                    grown = np.zeros(max(2 * len(cell_rows), fill + len(members)), dtype=np.int64)
+                    grown[:fill] = cell_rows[:fill]
+                    cell_rows = self._cell_rows[c] = grown
+                cell_rows[fill:fill + len(members)] = rows[members]
+                listings.slot[rows[members]] = np.arange(fill, fill + len(members))
+                self._cell_fill[c] = fill + len(members)
+                cells.count[c] += len(members)
+                spread = np.linalg.norm(position[members] - cells.centroid[c], axis=1).max()
+                cells.radius[c] = max(cells.radius[c], spread)
+                cells.max_quantity[c] = max(cells.max_quantity[c], quantity[members].max())
+                cells.max_id[c] = max(cells.max_id[c], ids[members].max())
+
+    def remove(self, material_id: int) -> None:
+        with self._lock:
+            row = self._rows.pop(material_id, None)
+            if row is None:
+                return
+            self._release_terms(row)
+            self.listings.ids[row] = 0
+            self.listings.live[row] = False
+            self._leave_cell(int(self.listings.cell[row]))
+            self._free.append(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(self.listings.capacity)
+
+    def _release_terms(self, row: int) -> None:
+        for code in self.listings.name_terms[row]:
+            if code:
+                self._term_counts[code] -= 1
+
+    def _cell(self, industry: int, location: int, position: np.ndarray) -> int:
+        key = (industry, location)
+        cell = self._cell_ids.get(key)
+        if cell is None:
+            cell = self._cell_ids[key] = len(self._cell_rows)
+            self.cells.reserve(cell + 1)
+            self.cells.industry[cell] = industry
+            self.cells.location[cell] = location
+            # Listings are geocoded from their location, so a cell's listings
+            # usually share the first one's position
+            self.cells.centroid[cell] = position
+            self._cell_rows.append(np.zeros(16, dtype=np.int64))
+            self._cell_fill.append(0)
+            self._cell_stale.append(0)
+        return cell
+
+    def _join_cell(self, cell: int, row: int) -> None:
+        fill = self._cell_fill[cell]
+        rows = self._cell_rows[cell]
+        if fill == len(rows):
+            rows = self._cell_rows[cell] = np.concatenate([rows, np.zeros(len(rows), dtype=np.int64)])
+        rows[fill] = row
+        self._cell_fill[cell] = fill + 1
+        self.listings.cell[row] = cell
+        self.listings.slot[row] = fill
+        self.cells.count[cell] += 1
+
+    def _leave_cell(self, cell: int) -> None:
+        """Account for a listing that moved out of or closed in a cell; its row
+        is already marked so the cell's list skips it"""
+        self.cells.count[cell] -= 1
+        self._cell_stale[cell] += 1
+        if 2 * self._cell_stale[cell] > self._cell_fill[cell]:
+            rows = self._members(cell)
+            self._cell_rows[cell] = np.concatenate([rows, np.zeros(max(16, len(rows)), dtype=np.int64)])
+            self._cell_fill[cell] = len(rows)
+            self._cell_stale[cell] = 0
+            self.listings.slot[rows] = np.arange(len(rows))
+
+    def _members(self, cell: int) -> np.ndarray:
+        """Rows of the listings currently in a cell"""
+        fill = self._cell_fill[cell]
+        rows = self._cell_rows[cell][:fill]
+        if not self._cell_stale[cell]:
+            return rows
+        listings = self.listings
+        current = (listings.cell[rows] == cell) & (listings.slot[rows] == np.arange(fill)) & listings.live[rows]
+        return rows[current]
+
+    def _table(self, vocabulary: Vocabulary, preferences: Dict[str, float], idf: bool = False) -> np.ndarray:
+        """Preference weight per code, scaled so the strongest is 1"""
+        table = np.zeros(len(vocabulary), dtype=np.float32)
+        live = len(self._rows) or 1
+        for value, weight in preferences.items():
+            code = vocabulary.lookup(value)
+            if code:
+                # Terms on many listings ("industrial", "mixed") say little about the buyer
+                table[code] = weight * (math.log(1 + live / max(self._term_counts[code], 1)) if idf else 1.0)
+        peak = table.max()
+        return table / peak if peak > 0 else table
+
+    def recommend(self, profile: BuyerProfile, k: int, exclude_owner: Optional[int] = None,
+                  exclude_ids: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Return the k best (material_id, score) pairs for the profile, best first"""
+        weights = SIGNAL_WEIGHTS
+        with self._lock:
+            m = len(self._cell_rows)
+            if m == 0 or k <= 0:
+                return []
+            cells, listings = self.cells, self.listings
+            max_id = max(self._max_id, 1)
+            origin = profile.origin
+            quantity = profile.quantity
+            term_table = self._table(self.terms, profile.terms, idf=True) if profile.terms else None
+
+            # What every listing in a cell shares, and the most the rest can add
+            base = weights["industry"] * self._table(self.industries, profile.industries)[cells.industry[:m]]
+            base += weights["location"] * self._table(self.locations, profile.locations)[cells.location[:m]]
+            bound = base + weights["freshness"] * cells.max_id[:m] / max_id
+            if term_table is not None:
+                bound += weights["name"]
+            if quantity:
+                bound += weights["quantity"] * np.minimum(cells.max_quantity[:m] / quantity, 1.0)
+            if origin is not None:
+                gap = np.maximum(np.linalg.norm(cells.centroid[:m] - origin, axis=1) - cells.radius[:m], 0.0)
+                bound += proximity(gap * gap)
+            bound[cells.count[:m] <= 0] = -np.inf
+
+            excluded = {self._rows[i] for i in exclude_ids if i in self._rows}
+            wanted = k + len(excluded)
+            best_rows = np.zeros(0, dtype=np.int64)
+            best_scores = np.zeros(0, dtype=np.float32)
+            threshold = -np.inf
+            for cell in np.argsort(-bound, kind="stable"):
+                if bound[cell] == -np.inf or (len(best_rows) >= wanted and bound[cell] <= threshold):
+                    break
+                rows = self._members(cell)
+                if exclude_owner is not None:
+                    rows = rows[listings.owners[rows] != exclude_owner]
+                if not len(rows):
+                    continue
+
+                scores = np.full(len(rows), base[cell], dtype=np.float32)
+                scores += weights["freshness"] * (listings.ids[rows] / max_id).astype(np.float32)
+                if term_table is not None:
+                    scores += weights["name"] * term_table[listings.name_terms[rows]].max(axis=1)
+                if quantity:
+                    scores += weights["quantity"] * np.minimum(listings.quantity[rows] / quantity, 1.0)
+                if origin is not None:
+                    scores += proximity(2.0 - 2.0 * (listings.position[rows] @ origin))
+
+                best_rows = np.concatenate([best_rows, rows])
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_rows) > wanted:
+                    keep = np.argpartition(-best_scores, wanted - 1)[:wanted]
+                    best_rows, best_scores = best_rows[keep], best_scores[keep]
+                if len(best_rows) >= wanted:
+                    threshold = best_scores.min()
+
+            order = np.argsort(-best_scores, kind="stable")
+            ranked = [
+                (int(listings.ids[row]), float(score))
+                for row, score in zip(best_rows[order], best_scores[order])
+                if row not in excluded
+            ]
+        return ranked[:k]
+
+# Shared per-process index, built lazily from the database on first use
+recommendation_index = MaterialFeatureIndex()
+recommendation_index_build = IndexBuild(recommendation_index)
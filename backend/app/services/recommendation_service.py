@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
+from prometheus_client import Histogram
+from app.db.database import get_session
+from app.models.models import Material, Transaction, TransactionStatus
+from app.schemas.recommendation_schema import RecommendedMaterial
+from app.services.index_build import load_batches
+from app.services.recommendation_index import BuyerProfile, recommendation_index, recommendation_index_build
+from app.services.transaction_states import HOLDING_STATUSES
+
+# Most recent requests that make up a buyer's profile
+HISTORY_LIMIT = 200
+# A request's weight halves every this many days
+HISTORY_HALF_LIFE_DAYS = 180
+# Finished trades say more about what a buyer wants than refused ones
+STATUS_WEIGHTS = {
+    TransactionStatus.COMPLETED.value: 1.0,
+    TransactionStatus.ACCEPTED.value: 0.8,
+    TransactionStatus.PENDING.value: 0.6,
+    TransactionStatus.REJECTED.value: 0.3,
+    TransactionStatus.CANCELLED.value: 0.2,
+}
+# Extra candidates scored per request, to cover listings sold out since they were indexed
+OVERFETCH = 10
+# Listings read and indexed per step of a build
+BUILD_BATCH_SIZE = 5000
+
+RECOMMENDATION_TIME = Histogram(
+    "recommendation_scoring_seconds",
+    "Time to score the indexed listings against one buyer",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+# What the index stores per listing, in MaterialFeatureIndex.add order. Its
+# quantity is what is left to request, net of open transactions' holds.
+INDEX_COLUMNS = (
+    Material.id,
+    Material.owner_id,
+    Material.name,
+    Material.industry,
+    Material.location,
+    (Material.quantity - Material.reserved).label("available"),
+    Material.latitude,
+    Material.longitude
+)
+
+def index_listing(row) -> None:
+    """Bring a listing, as a row of INDEX_COLUMNS, into the index once it is built"""
+    recommendation_index_build.apply(recommendation_index.add, *row)
+
+def index_material(material: Material) -> None:
+    """Bring a created or changed listing into the index, once it is built"""
+    index_listing((
+        material.id,
+        material.owner_id,
+        material.name,
+        material.industry,
+        material.location,
+        (material.quantity or 0) - (material.reserved or 0),
+        material.latitude,
+        material.longitude
+    ))
+
+class RecommendationService:
+    def __init__(self, db: AsyncSession = Depends(get_session)):
+        self.db = db
+
+    async def _load_index(self) -> None:
+        """Load every listing with stock left to request into the in-process index"""
+        rows = await self.db.stream(
+            select(*INDEX_COLUMNS)
+            .where(Material.quantity > Material.reserved)
+            .execution_options(yield_per=BUILD_BATCH_SIZE)
+        )
+        await load_batches(rows, recommendation_index.add_many, BUILD_BATCH_SIZE)
+
+    async def _profile(self, user_id: int):
+        """The buyer's profile from their recent requests, and the listings they
+        already have an open request on"""
+        rows = await self.db.execute(
+            select(
+                Transaction.material_id,
+                Transaction.quantity,
+                Transaction.status,
+                Transaction.created_at,
+                Material.name,
+                Material.industry,
+                Material.location,
+                Material.latitude,
+                Material.longitude
+            )
+            .join(Material, Material.id == Transaction.material_id)
+            .where(Transaction.from_owner_id == user_id)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+            .limit(HISTORY_LIMIT)
+        )
+        profile = BuyerProfile()
+        open_requests = set()
+        now = datetime.utcnow()
+        for row in rows:
+            age_days = (now - row.created_at).total_seconds() / 86400 if row.created_at else 0
+            weight = STATUS_WEIGHTS.get(row.status, 0.5) * 0.5 ** (max(age_days, 0) / HISTORY_HALF_LIFE_DAYS)
+            profile.add(weight, row.name, row.industry, row.location, row.quantity, row.latitude, row.longitude)
+            if row.status in HOLDING_STATUSES:
+                open_requests.add(row.material_id)
+        return profile, open_requests
+
+    async def get_recommendations(
+        self,
+        user_id: int,
+        limit: int = 20,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> List[RecommendedMaterial]:
+        """Open listings best matching what the buyer has requested before: same
+        industries, names and places, enough stock for their usual quantity, and
+        close by. Buyers with no history get the newest listings, nearest first
+        when a point is given. Their own listings and ones they already have an
+        open request on are left out."""
+        await recommendation_index_build.ensure(self._load_index)
+        profile, open_requests = await self._profile(user_id)
+        if latitude is not None and longitude is not None:
+            profile.set_origin(latitude, longitude)
+
+        with RECOMMENDATION_TIME.time():
+            hits = recommendation_index.recommend(
+                profile, limit + OVERFETCH, exclude_owner=user_id, exclude_ids=open_requests
+            )
+        if not hits:
+            return []
+
+        # The index may trail other processes' writes; read the listings fresh
+        # and drop any with nothing left to request
+        rows = await self.db.execute(
+            select(
+                Material.id,
+                Material.name,
+                Material.industry,
+                Material.quantity,
+                Material.unit,
+                Material.location,
+                Material.condition,
+                Material.description,
+                Material.status,
+                Material.owner_id
+            ).where(
+                Material.id.in_([material_id for material_id, _ in hits]),
+                Material.quantity > Material.reserved
+            )
+        )
+        by_id = {row.id: row for row in rows}
+        recommendations = []
+        for material_id, score in hits:
+            material = by_id.get(material_id)
+            if material is None:
+                continue
+            recommendations.append(RecommendedMaterial(
+                id=material.id,
+                name=material.name,
+                industry=material.industry,
+                quantity=material.quantity,
+                unit=material.unit,
+                location=material.location,
+                condition=material.condition,
+                description=material.description,
+                status=material.status or "available",
+                owner_id=material.owner_id,
+                score=round(score, 4)
+            ))
+            if len(recommendations) == limit:
+                break
+        return recommendations
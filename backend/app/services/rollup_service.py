@@ -0,0 +1,232 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import event, inspect, or_, select, union_all
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from app.db.database import get_db
+from app.models.models import AnalyticsRollup, Material, Transaction, User
+
+TOTAL_BUCKET = datetime(1970, 1, 1)
+
+TRANSACTIONS = "transactions"
+USERS = "users"
+ACTIVE_MATERIALS = "active_materials"
+
+# Status changes are the hot path, so status keeps hourly buckets; the other
+# breakdowns only feed all-time rankings and daily trends
+STATUS_GRANULARITIES = ("hour", "day", "total")
+DIMENSION_GRANULARITIES = ("day", "total")
+
+RollupKey = Tuple[str, str, datetime, str, str]
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "total":
+        return TOTAL_BUCKET
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def status_value(status) -> str:
+    return getattr(status, "value", status) or ""
+
+def is_active(material: Material) -> bool:
+    return (material.quantity or 0) > 0
+
+class RollupDeltas:
+    """Accumulates counter changes so one flush issues one batched upsert"""
+
+    def __init__(self):
+        self.deltas: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, metric: str, granularities: Iterable[str], timestamp: datetime,
+            dimension: str = "", value: str = "", count: int = 1, quantity: float = 0.0) -> None:
+        for granularity in granularities:
+            delta = self.deltas[(metric, granularity, bucket_start(timestamp, granularity), dimension, value or "")]
+            delta[0] += count
+            delta[1] += quantity
+
+    def add_transaction(self, created_at: datetime, quantity: float, status: str, name: str, location: str,
+                        sign: int, count_dimensions: bool = True) -> None:
+        timestamp = created_at or datetime.utcnow()
+        quantity = (quantity or 0.0) * sign
+        self.add(TRANSACTIONS, STATUS_GRANULARITIES, timestamp, "status", status, sign, quantity)
+        if count_dimensions:
+            self.add(TRANSACTIONS, DIMENSION_GRANULARITIES, timestamp, "material", name, sign, quantity)
+            self.add(TRANSACTIONS, DIMENSION_GRANULARITIES, timestamp, "location", location, sign, quantity)
+
+    def write(self, connection) -> None:
+        rows = [
+            {
+                "metric": metric,
+                "granularity": granularity,
+                "bucket_start": start,
+                "dimension": dimension,
+                "dimension_value": value,
+                "count": count,
+                "quantity": quantity,
+            }
+            for (metric, granularity, start, dimension, value), (count, quantity) in self.deltas.items()
+            if count or quantity
+        ]
+        if rows:
+            upsert_rollups(connection, rows)
+
+def upsert_rollups(connection, rows: List[dict]) -> None:
+    """Add each row's count and quantity onto its bucket, creating the bucket if needed"""
+    table = AnalyticsRollup.__table__
+    key_columns = ["metric", "granularity", "bucket_start", "dimension", "dimension_value"]
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                "count": table.c.count + stmt.excluded["count"],
+                "quantity": table.c.quantity + stmt.excluded.quantity,
+            }
+        )
+        connection.execute(stmt, rows)
+        return
+
+    for row in rows:
+        match = [table.c[column] == row[column] for column in key_columns]
+        updated = connection.execute(
+            table.update().where(*match).values(
+                count=table.c.count + row["count"],
+                quantity=table.c.quantity + row["quantity"]
+            )
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+@event.listens_for(Session, "after_flush")
+def maintain_rollups(session: Session, flush_context) -> None:
+    """Translate the rows this flush wrote into rollup deltas, inside the same transaction"""
+    deltas = RollupDeltas()
+    now = datetime.utcnow()
+    new_transactions = []
+    changed_transactions = []
+    deleted_transactions = []
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            new_transactions.append(obj)
+        elif isinstance(obj, User):
+            deltas.add(USERS, DIMENSION_GRANULARITIES, obj.created_at or now)
+        elif isinstance(obj, Material) and is_active(obj):
+            deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, now)
+
+    for obj in session.dirty:
+        if isinstance(obj, Transaction):
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and history.deleted:
+                changed_transactions.append((obj, status_value(history.deleted[0])))
+        elif isinstance(obj, Material):
+            history = inspect(obj).attrs.quantity.history
+            if history.has_changes() and history.deleted:
+                was_active = (history.deleted[0] or 0) > 0
+                if was_active != is_active(obj):
+                    deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, now, count=1 if is_active(obj) else -1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            deleted_transactions.append(obj)
+        elif isinstance(obj, User):
+            deltas.add(USERS, DIMENSION_GRANULARITIES, obj.created_at or now, count=-1)
+        elif isinstance(obj, Material) and is_active(obj):
+            deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, now, count=-1)
+
+    if not (deltas.deltas or new_transactions or changed_transactions or deleted_transactions):
+        return
+
+    connection = session.connection()
+    material_ids = {t.material_id for t in new_transactions + deleted_transactions}
+    materials = {}
+    if material_ids:
+        materials = {
+            row.id: (row.name or "", row.location or "")
+            for row in connection.execute(
+                select(Material.id, Material.name, Material.location).where(Material.id.in_(material_ids))
+            )
+        }
+
+    for sign, transactions in ((1, new_transactions), (-1, deleted_transactions)):
+        for t in transactions:
+            name, location = materials.get(t.material_id, ("", ""))
+            deltas.add_transaction(t.created_at, t.quantity, status_value(t.status), name, location, sign)
+    for t, old_status in changed_transactions:
+        # Only the status breakdown moves; material and location counts are unchanged
+        deltas.add_transaction(t.created_at, t.quantity, old_status, "", "", -1, count_dimensions=False)
+        deltas.add_transaction(t.created_at, t.quantity, status_value(t.status), "", "", 1, count_dimensions=False)
+
+    deltas.write(connection)
+
+class RollupService:
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def rebuild(self, batch_size: int = 5000) -> None:
+        """Recompute every rollup from the source tables, e.g. after a bulk load"""
+        self.db.query(AnalyticsRollup).delete()
+        deltas = RollupDeltas()
+        now = datetime.utcnow()
+
+        transactions = self.db.query(
+            Transaction.created_at,
+            Transaction.quantity,
+            Transaction.status,
+            Material.name,
+            Material.location
+        ).outerjoin(Material, Material.id == Transaction.material_id)\
+            .execution_options(yield_per=batch_size)
+        for created_at, quantity, status, name, location in transactions:
+            deltas.add_transaction(created_at, quantity, status_value(status), name, location, 1)
+
+        for (created_at,) in self.db.query(User.created_at).execution_options(yield_per=batch_size):
+            deltas.add(USERS, DIMENSION_GRANULARITIES, created_at or now)
+
+        # Active listings have no activation timestamp; count them on their listing date
+        active = self.db.query(Material.created_at).filter(Material.quantity > 0)\
+            .execution_options(yield_per=batch_size)
+        for (created_at,) in active:
+            deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, created_at or now)
+
+        deltas.write(self.db.connection())
+        self.db.commit()
+
+    def dashboard_rows(self, since: datetime, top_materials: int = 10) -> List[AnalyticsRollup]:
+        return self.db.execute(dashboard_query(since, top_materials)).all()
+
+def dashboard_query(since: datetime, top_materials: int = 10):
+    """Everything the dashboard needs in one round trip: all-time totals and
+    breakdowns, the top materials, and daily buckets since `since`"""
+    columns = [
+        AnalyticsRollup.metric,
+        AnalyticsRollup.granularity,
+        AnalyticsRollup.bucket_start,
+        AnalyticsRollup.dimension,
+        AnalyticsRollup.dimension_value,
+        AnalyticsRollup.count,
+        AnalyticsRollup.quantity,
+    ]
+    totals = select(*columns).where(
+        AnalyticsRollup.granularity == "total",
+        AnalyticsRollup.dimension.in_(["", "status", "location"])
+    )
+    top = select(*columns).where(
+        AnalyticsRollup.metric == TRANSACTIONS,
+        AnalyticsRollup.granularity == "total",
+        AnalyticsRollup.dimension == "material",
+        AnalyticsRollup.count > 0
+    ).order_by(AnalyticsRollup.count.desc()).limit(top_materials).subquery()
+    recent = select(*columns).where(
+        AnalyticsRollup.granularity == "day",
+        AnalyticsRollup.bucket_start >= bucket_start(since, "day"),
+        or_(AnalyticsRollup.dimension == "", AnalyticsRollup.dimension == "status")
+    )
+    return union_all(totals, select(*top.c), recent)
@@ -0,0 +1,219 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.services.index_build import IndexBuild
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Matches in the name outrank matches in the industry, which outrank the description
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "industry": 2.0,
+    "description": 1.0,
+}
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'Mégrine' and 'megrine' index the same"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(normalize(text))
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MaterialSearchIndex:
+    """In-process inverted index with trigram fuzzy matching over material listings.
+
+    Used when the database has no native full-text search (SQLite). Postings
+    are bucketed by field weight so the best-scoring documents for a term can
+    be read first, and each trigram maps to the vocabulary terms containing it
+    so misspelled query terms can be expanded to their closest indexed terms.
+    Like the PostgreSQL path, every query term must match.
+    """
+
+    # Below this many candidates every match is scored; above it the top-k is
+    # found with the threshold algorithm over the weight-ordered postings.
+    EXHAUSTIVE_LIMIT = 2000
+
+    def __init__(self, fuzzy_threshold: float = 0.4, max_expansions: int = 5):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_expansions = max_expansions
+        self._postings: Dict[str, Dict[float, Set[int]]] = defaultdict(dict)
+        self._term_docs: Dict[str, Set[int]] = defaultdict(set)
+        self._trigram_terms: Dict[str, Set[str]] = defaultdict(set)
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._lock = threading.RLock()
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: int, name: Optional[str], description: Optional[str], industry: Optional[str]) -> None:
+        """Index a listing, replacing any previous version of it"""
+        weights: Dict[str, float] = defaultdict(float)
+        for field, text in (("name", name), ("industry", industry), ("description", description)):
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, weight in weights.items():
+                docs = self._term_docs[term]
+                if not docs:
+                    for gram in trigrams(term):
+                        self._trigram_terms[gram].add(term)
+                self._postings[term].setdefault(weight, set()).add(doc_id)
+                docs.add(doc_id)
+            self._doc_terms[doc_id] = dict(weights)
+
+    def add_many(self, docs: Iterable[Tuple[int, Optional[str], Optional[str], Optional[str]]]) -> None:
+        for doc_id, name, description, industry in docs:
+            self.add(doc_id, name, description, industry)
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._term_docs.clear()
+            self._trigram_terms.clear()
+            self._doc_terms.clear()
+            self.built = False
+
+    def _remove_locked(self, doc_id: int) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if not terms:
+            return
+        for term, weight in terms.items():
+            buckets = self._postings[term]
+            bucket = buckets.get(weight)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del buckets[weight]
+            docs = self._term_docs[term]
+            docs.discard(doc_id)
+            if not docs:
+                del self._term_docs[term]
+                del self._postings[term]
+                for gram in trigrams(term):
+                    candidates = self._trigram_terms.get(gram)
+                    if candidates is not None:
+                        candidates.discard(term)
+                        if not candidates:
+                            del self._trigram_terms[gram]
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Indexed terms matching a query token, with a similarity in (0, 1]"""
+        if token in self._term_docs:
+            return [(token, 1.0)]
+
+        query_grams = trigrams(token)
+        overlap: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for term in self._trigram_terms.get(gram, ()):
+                overlap[term] += 1
+
+        matches = []
+        for term, shared in overlap.items():
+            similarity = shared / (len(query_grams) + len(term) + 2 - shared)
+            if term.startswith(token):
+                # Treat prefixes as near matches so search-as-you-type works
+                similarity = max(similarity, 0.9)
+            if similarity >= self.fuzzy_threshold:
+                matches.append((term, similarity))
+        return heapq.nlargest(self.max_expansions, matches, key=lambda m: m[1])
+
+    def _score(self, doc_id: int, boosts: Dict[str, float]) -> float:
+        doc_terms = self._doc_terms[doc_id]
+        return sum(doc_terms.get(term, 0.0) * boost for term, boost in boosts.items())
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Tuple[int, float]]:
+        """Return (doc_id, score) pairs, best first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        wanted = offset + limit
+
+        with self._lock:
+            total_docs = len(self._doc_terms) or 1
+            boosts: Dict[str, float] = {}
+            candidates: Optional[Set[int]] = None
+            for token in tokens:
+                expansions = self._expand(token)
+                if not expansions:
+                    return []
+                for term, similarity in expansions:
+                    idf = math.log(1 + total_docs / len(self._term_docs[term]))
+                    boosts[term] = boosts.get(term, 0.0) + similarity * idf
+                if len(expansions) == 1:
+                    token_docs = self._term_docs[expansions[0][0]]
+                else:
+                    token_docs = set().union(*(self._term_docs[term] for term, _ in expansions))
+                candidates = token_docs if candidates is None else candidates & token_docs
+                if not candidates:
+                    return []
+
+            if len(candidates) <= max(self.EXHAUSTIVE_LIMIT, wanted):
+                scored = ((doc_id, self._score(doc_id, boosts)) for doc_id in candidates)
+                ranked = heapq.nlargest(wanted, scored, key=lambda item: (item[1], item[0]))
+            else:
+                ranked = self._threshold_top_k(boosts, candidates, wanted)
+        return ranked[offset:offset + limit]
+
+    def _threshold_top_k(self, boosts: Dict[str, float], candidates: Set[int], wanted: int) -> List[Tuple[int, float]]:
+        """Fagin's threshold algorithm: read every term's postings in descending
+        contribution order and stop once no unseen document can beat the
+        current k-th best score."""
+        streams = [self._iter_postings(self._postings[term], boost) for term, boost in boosts.items()]
+        if len(streams) == 1:
+            # A single term's stream is already ranked
+            return [(doc_id, score) for score, doc_id in islice(streams[0], wanted)]
+
+        heap: List[Tuple[float, int]] = []
+        seen: Set[int] = set()
+        last = [0.0] * len(streams)
+        active = list(range(len(streams)))
+        while active:
+            for i in list(active):
+                entry = next(streams[i], None)
+                if entry is None:
+                    active.remove(i)
+                    last[i] = 0.0
+                    continue
+                contribution, doc_id = entry
+                last[i] = contribution
+                if doc_id in seen or doc_id not in candidates:
+                    continue
+                seen.add(doc_id)
+                item = (self._score(doc_id, boosts), doc_id)
+                if len(heap) < wanted:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            if len(heap) >= wanted and heap[0][0] >= sum(last):
+                break
+        return [(doc_id, score) for score, doc_id in sorted(heap, reverse=True)]
+
+    @staticmethod
+    def _iter_postings(buckets: Dict[float, Set[int]], boost: float):
+        for weight in sorted(buckets, reverse=True):
+            contribution = weight * boost
+            for doc_id in buckets[weight]:
+                yield contribution, doc_id
+
+# Shared per-process index, built lazily from the database on first search
+search_index = MaterialSearchIndex()
+search_index_build = IndexBuild(search_index)
@@ -0,0 +1,73 @@
+from typing import Optional
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
+from app.db.database import get_session
+from app.models.models import Material, search_document
+from app.schemas.material import MaterialResponse
+from app.schemas.pagination import Page
+from app.services.index_build import load_batches
+from app.services.search_index import search_index, search_index_build, tokenize
+
+# Listings read and indexed per step of a build
+BUILD_BATCH_SIZE = 1000
+
+class SearchService:
+    def __init__(self, db: AsyncSession = Depends(get_session)):
+        self.db = db
+
+    def _uses_full_text(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    async def _load_index(self) -> None:
+        rows = await self.db.stream(
+            select(Material.id, Material.name, Material.description, Material.industry)
+            .execution_options(yield_per=BUILD_BATCH_SIZE)
+        )
+        await load_batches(rows, search_index.add_many, BUILD_BATCH_SIZE)
+
+    async def _ensure_index(self) -> None:
+        """Build the in-process index the first time it is needed"""
+        await search_index_build.ensure(self._load_index)
+
+    async def search(self, q: str, limit: int = 20, cursor: Optional[str] = None) -> Page[MaterialResponse]:
+        """Ranked search over name, description and industry.
+
+        The cursor is the offset of the next page, since relevance ranking
+        has no stable keyset to resume from.
+        """
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        tokens = tokenize(q)
+        if not tokens:
+            return Page[MaterialResponse](items=[])
+
+        if self._uses_full_text():
+            # Prefix-match every term so partial words still hit the GIN index
+            ts_query = func.to_tsquery(
+                literal_column("'simple'::regconfig"),
+                " & ".join(f"{token}:*" for token in tokens)
+            )
+            document = search_document(Material.name, Material.description, Material.industry)
+            materials = (await self.db.scalars(
+                select(Material)
+                .where(document.op("@@")(ts_query))
+                .order_by(func.ts_rank_cd(document, ts_query).desc(), Material.id.desc())
+                .offset(offset)
+                .limit(limit + 1)
+            )).all()
+            has_more = len(materials) > limit
+            materials = materials[:limit]
+        else:
+            await self._ensure_index()
+            hits = search_index.search(q, limit=limit + 1, offset=offset)
+            has_more = len(hits) > limit
+            ids = [doc_id for doc_id, _ in hits[:limit]]
+            by_id = {
+                m.id: m for m in await self.db.scalars(select(Material).where(Material.id.in_(ids)))
+            } if ids else {}
+            materials = [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+        return Page[MaterialResponse](
+            items=[MaterialResponse.model_validate(m) for m in materials],
+            next_cursor=str(offset + limit) if has_more else None
+        )
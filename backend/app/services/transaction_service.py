@@ -1,25 +1,125 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload, aliased
-from fastapi import Depends, HTTPException, status
-from app.db.database import get_db
-from app.models.models import Transaction, Material, Notification, TransactionStatus, User
+from typing import AsyncIterator, Optional
+from sqlalchemy import case, func, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, aliased
+from sqlalchemy.orm.exc import StaleDataError
+from fastapi import Depends, HTTPException
+from app.db.database import get_session
+from app.models.models import Transaction, Material, TransactionStatus, User
 from app.schemas.transaction_schema import TransactionCreate, TransactionResponse
+from app.services.pagination import encode_cursor, keyset_before
+from app.services.outbox import enqueue, worker as outbox_worker
+from app.services.rollup_service import ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, RollupDeltas, status_value
+from app.services.notification_service import publish_material_event
+from app.services.transaction_states import HOLDING_STATUSES, check_transition
+from app.services.recommendation_service import INDEX_COLUMNS, index_listing
+from app.core.cache import MATERIALS, TRANSACTIONS, cache_backend, invalidate, user_tag
+from app.core.lru import LRUCache
+from app.core.log import get_logger
 from datetime import datetime
 
+logger = get_logger(__name__)
+
+# Rows per round trip when streaming every transaction
+STREAM_BATCH_SIZE = 1000
+
+# Per-user status counts behind the /transactions/stats badge that every open
+# client polls, for when no response cache is configured (CACHE_BACKEND=none).
+# Writes in this process evict both parties; the TTL bounds staleness from
+# writes handled by other workers.
+stats_cache = LRUCache(maxsize=10000, ttl=30)
+
+def with_parties(query):
+    """Eager-load what TransactionResponse reads, since async sessions cannot lazy load"""
+    return query.options(
+        joinedload(Transaction.material),
+        joinedload(Transaction.from_user),
+        joinedload(Transaction.to_user)
+    )
+
+def released(quantity: float):
+    """Reserved amount after giving back `quantity`; never below zero, since
+    transactions created before reservations existed hold nothing"""
+    return case((Material.reserved > quantity, Material.reserved - quantity), else_=0.0)
+
+def transaction_event(transaction: Transaction, material_name: Optional[str], **extra) -> dict:
+    """Outbox payload for a transaction change"""
+    return {
+        "transaction_id": transaction.id,
+        "material_id": transaction.material_id,
+        "material_name": material_name,
+        "quantity": transaction.quantity,
+        "from_owner_id": transaction.from_owner_id,
+        "to_owner_id": transaction.to_owner_id,
+        "status": status_value(transaction.status),
+        **extra
+    }
+
 class TransactionService:
-    def __init__(self, db: Session = Depends(get_db)):
+    def __init__(self, db: AsyncSession = Depends(get_session)):
         self.db = db
 
+    async def _load(self, transaction_id: int) -> Optional[Transaction]:
+        query = with_parties(select(Transaction)).where(Transaction.id == transaction_id)
+        result = await self.db.execute(query.execution_options(populate_existing=True))
+        return result.scalars().first()
+
+    async def _reserve(self, material_id: int, quantity: float):
+        """Hold `quantity` of a listing with one conditional UPDATE, so concurrent
+        buyers can never hold more than is in stock. Returns the listing as a row
+        of INDEX_COLUMNS after the hold, or None when not enough is left."""
+        return (await self.db.execute(
+            update(Material)
+            .where(Material.id == material_id, Material.quantity - Material.reserved >= quantity)
+            .values(reserved=Material.reserved + quantity)
+            .returning(*INDEX_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )).first()
+
+    async def _settle(self, transaction: Transaction, new_status: str) -> Optional[tuple]:
+        """Move the transaction's hold on stock along with a status change: take it
+        out of stock on completion and release it on rejection or cancellation.
+        Every allowed transition starts from a holding status. Returns the listing
+        as a row of INDEX_COLUMNS when its stock or hold changed."""
+        if new_status == TransactionStatus.COMPLETED.value:
+            listing = (await self.db.execute(
+                update(Material)
+                .where(Material.id == transaction.material_id)
+                .values(
+                    quantity=Material.quantity - transaction.quantity,
+                    reserved=released(transaction.quantity)
+                )
+                .returning(*INDEX_COLUMNS, Material.quantity.label("remaining"))
+                .execution_options(synchronize_session=False)
+            )).first()
+            if listing is None:
+                return None
+            # A bulk UPDATE skips the flush hook; move the listing out of the active count here
+            if listing.remaining <= 0 < listing.remaining + transaction.quantity:
+                deltas = RollupDeltas()
+                deltas.add(ACTIVE_MATERIALS, DIMENSION_GRANULARITIES, datetime.utcnow(), count=-1)
+                await self.db.run_sync(lambda session: deltas.write(session.connection()))
+            return tuple(listing)[:len(INDEX_COLUMNS)]
+
+        if new_status not in HOLDING_STATUSES:
+            return (await self.db.execute(
+                update(Material)
+                .where(Material.id == transaction.material_id)
+                .values(reserved=released(transaction.quantity))
+                .returning(*INDEX_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )).first()
+        return None
+
     async def create_transaction(self, transaction_data: TransactionCreate, from_user_id: int) -> TransactionResponse:
         """Create a new transaction request"""
         try:
-            # Verify material exists and has enough quantity
-            material = self.db.query(Material).filter(Material.id == transaction_data.material_id).first()
-            if not material:
-                raise HTTPException(status_code=404, detail="Material not found")
-            
-            if material.quantity < transaction_data.quantity:
-                raise HTTPException(status_code=400, detail="Requested quantity exceeds available amount")
+            # Reserve the quantity first; the check and the hold are one statement
+            material = await self._reserve(transaction_data.material_id, transaction_data.quantity)
+            if material is None:
+                if await self.db.get(Material, transaction_data.material_id) is None:
+                    raise HTTPException(status_code=404, detail="Material not found")
+                raise HTTPException(status_code=409, detail="Requested quantity exceeds available amount")
 
             # Create new transaction
             transaction = Transaction(
@@ -30,25 +130,34 @@ class TransactionService:
             )
             
             self.db.add(transaction)
-            self.db.commit()
-            self.db.refresh(transaction)
-            return TransactionResponse.model_validate(transaction)
+            await self.db.flush()
+            enqueue(self.db, "transaction.created", transaction_event(transaction, material.name))
+            await self.db.commit()
+            await self._invalidate(transaction)
+            index_listing(material)
+            outbox_worker.wake()
+            return TransactionResponse.model_validate(await self._load(transaction.id))
 
+        except HTTPException:
+            await self.db.rollback()
+            raise
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def update_transaction_status(self, transaction_id: int, new_status: str, user_id: int) -> TransactionResponse:
-        """Update transaction status"""
+    async def update_transaction_status(
+        self,
+        transaction_id: int,
+        new_status: str,
+        user_id: int,
+        expected_version: Optional[int] = None
+    ) -> TransactionResponse:
+        """Move a transaction to `new_status` if the state machine allows it. With
+        `expected_version`, refuse unless nobody changed it since the caller read it."""
+        topic = "transaction.completed" if new_status == TransactionStatus.COMPLETED.value \
+            else "transaction.status_changed"
         try:
-            transaction = self.db.query(Transaction)\
-                .options(
-                    joinedload(Transaction.material),
-                    joinedload(Transaction.from_user),
-                    joinedload(Transaction.to_user)
-                )\
-                .filter(Transaction.id == transaction_id)\
-                .first()
+            transaction = await self._load(transaction_id)
 
             if not transaction:
                 raise HTTPException(status_code=404, detail="Transaction not found")
@@ -56,220 +165,292 @@ class TransactionService:
             if not transaction.material:
                 raise HTTPException(status_code=400, detail="Transaction has no associated material")
 
-            # Authorization check
-            if new_status == "cancelled":
-                if transaction.from_owner_id != user_id:
-                    raise HTTPException(status_code=403, detail="Not authorized to cancel this transaction")
-            else:
-                if transaction.to_owner_id != user_id:
-                    raise HTTPException(status_code=403, detail="Not authorized to update this transaction")
+            new_status = check_transition(transaction, new_status, user_id).value
+            if expected_version is not None and transaction.version != expected_version:
+                raise HTTPException(status_code=409, detail="Transaction was changed by another request")
 
+            # No lock is taken on the read. The UPDATE matches the version that was
+            # read, so of two concurrent changes the second fails here, before it
+            # touches the listing, and its whole transaction rolls back.
             transaction.status = new_status
-            self.db.commit()
-            self.db.refresh(transaction)
+            await self.db.flush()
+            listing = await self._settle(transaction, new_status)
+            enqueue(self.db, topic, transaction_event(transaction, transaction.material.name, actor_id=user_id))
+            await self.db.commit()
+            await self._invalidate(transaction, stock_changed=new_status == TransactionStatus.COMPLETED.value)
+            if listing is not None:
+                index_listing(listing)
+            outbox_worker.wake()
 
-            return TransactionResponse.model_validate(transaction)
+            return TransactionResponse.model_validate(await self._load(transaction_id))
 
+        except StaleDataError:
+            await self.db.rollback()
+            raise HTTPException(status_code=409, detail="Transaction was changed by another request")
         except HTTPException:
+            await self.db.rollback()
             raise
         except Exception as e:
-            print(f"Error updating transaction: {str(e)}")
-            self.db.rollback()
+            logger.exception("Failed to update transaction", extra={"transaction_id": transaction_id})
+            await self.db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to update transaction: {str(e)}"
             )
 
-    async def get_user_transactions(self, user_id: int) -> List[TransactionResponse]:
-        """Get all transactions for a user with related data"""
-        try:
-            # Create aliases for the User model for from_user and to_user
-            FromUser = aliased(User)
-            ToUser = aliased(User)
-
-            # Query with proper aliases
-            transactions = (
-                self.db.query(Transaction)
-                .join(Material)
-                .join(FromUser, FromUser.id == Transaction.from_owner_id)
-                .join(ToUser, ToUser.id == Transaction.to_owner_id)
-                .options(
-                    joinedload(Transaction.material),
-                    joinedload(Transaction.from_user),
-                    joinedload(Transaction.to_user)
-                )
-                .filter(
-                    (Transaction.from_owner_id == user_id) | 
-                    (Transaction.to_owner_id == user_id)
-                )
-                .all()
-            )
+    async def _listing_page(
+        self,
+        owner_filters: list,
+        status: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+        cursor: Optional[str],
+        limit: int
+    ) -> dict:
+        """One keyset page of transactions, newest first, as column-only rows
+        turned into plain dicts in TransactionResponse's shape, for json_response.
+
+        Each owner filter is its own branch, ordered and limited on its
+        (owner, created_at, id) index, and the branches are merged with
+        UNION ALL so no branch reads more than one page of ids.
+        """
+        filters = []
+        if status is not None:
+            filters.append(Transaction.status == status)
+        if created_after is not None:
+            filters.append(Transaction.created_at >= created_after)
+        if created_before is not None:
+            filters.append(Transaction.created_at < created_before)
+        if cursor:
+            filters.append(keyset_before(Transaction.created_at, Transaction.id, cursor))
+
+        branches = [
+            select(Transaction.id, Transaction.created_at)
+            .where(owner_filter, *filters)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+            .limit(limit + 1)
+            .subquery()
+            for owner_filter in owner_filters
+        ]
+        if len(branches) == 1:
+            page = branches[0]
+        else:
+            page = union_all(*(select(branch) for branch in branches)).subquery()
+
+        query = self._listing_query()\
+            .join(page, page.c.id == Transaction.id)\
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())\
+            .limit(limit + 1)
+        rows = (await self.db.execute(query)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return {"items": [self._row_to_item(row) for row in rows], "next_cursor": next_cursor}
 
-            # Debug logging
-            for t in transactions:
-                print(f"Transaction {t.id}:")
-                print(f"  Material: {t.material.name if t.material else 'None'}")
-                print(f"  From User: {t.from_user.username if t.from_user else 'None'}")
-                print(f"  To User: {t.to_user.username if t.to_user else 'None'}")
-
-            # Convert to response models with validation
-            responses = []
-            for t in transactions:
-                try:
-                    response = TransactionResponse.model_validate(t)
-                    responses.append(response)
-                except Exception as e:
-                    print(f"Error validating transaction {t.id}: {str(e)}")
-                    continue
-
-            return responses
+    @staticmethod
+    def _listing_query():
+        """Transaction columns joined with the listing and both parties, as _row_to_item reads them"""
+        FromUser = aliased(User)
+        ToUser = aliased(User)
+        return select(
+            Transaction.id,
+            Transaction.material_id,
+            Transaction.from_owner_id,
+            Transaction.to_owner_id,
+            Transaction.quantity,
+            Transaction.status,
+            Transaction.message,
+            Transaction.delivery_method,
+            Transaction.delivery_date,
+            Transaction.created_at,
+            Transaction.version,
+            Material.name.label("material_name"),
+            Material.description.label("material_description"),
+            Material.quantity.label("material_quantity"),
+            Material.unit.label("material_unit"),
+            Material.owner_id.label("material_owner_id"),
+            Material.status.label("material_status"),
+            FromUser.username.label("from_username"),
+            FromUser.email.label("from_email"),
+            FromUser.company_name.label("from_company_name"),
+            ToUser.username.label("to_username"),
+            ToUser.email.label("to_email"),
+            ToUser.company_name.label("to_company_name")
+        ).join(Material, Material.id == Transaction.material_id)\
+            .join(FromUser, FromUser.id == Transaction.from_owner_id)\
+            .join(ToUser, ToUser.id == Transaction.to_owner_id)
 
+    @staticmethod
+    def _row_to_item(row) -> dict:
+        return {
+            "id": row.id,
+            "material_id": row.material_id,
+            "from_owner_id": row.from_owner_id,
+            "to_owner_id": row.to_owner_id,
+            "quantity": row.quantity,
+            "status": row.status,
+            "message": row.message,
+            "delivery_method": row.delivery_method,
+            "delivery_date": row.delivery_date,
+            "created_at": row.created_at,
+            "version": row.version,
+            "material": {
+                "id": row.material_id,
+                "name": row.material_name,
+                "description": row.material_description,
+                "quantity": row.material_quantity,
+                "unit": row.material_unit,
+                "owner_id": row.material_owner_id,
+                "status": row.material_status
+            },
+            "from_user": {
+                "id": row.from_owner_id,
+                "username": row.from_username,
+                "email": row.from_email,
+                "company_name": row.from_company_name
+            },
+            "to_user": {
+                "id": row.to_owner_id,
+                "username": row.to_username,
+                "email": row.to_email,
+                "company_name": row.to_company_name
+            }
+        }
+
+    async def get_user_transactions(
+        self,
+        user_id: int,
+        status: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
+        """Get a page of the user's transactions, sent or received, newest first"""
+        try:
+            return await self._listing_page(
+                [
+                    Transaction.from_owner_id == user_id,
+                    # Trades with oneself are already in the first branch
+                    (Transaction.to_owner_id == user_id) & (Transaction.from_owner_id != user_id)
+                ],
+                status, created_after, created_before, cursor, limit
+            )
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Error fetching transactions: {str(e)}")
+            logger.exception("Failed to fetch transactions", extra={"user_id": user_id})
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to fetch transactions: {str(e)}"
             )
 
-    async def get_incoming_transactions(self, user_id: int) -> List[TransactionResponse]:
+    async def get_incoming_transactions(
+        self,
+        user_id: int,
+        status: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
         """Get incoming transactions where user is the provider"""
-        transactions = self.db.query(Transaction)\
-            .options(
-                joinedload(Transaction.material),
-                joinedload(Transaction.from_user),
-                joinedload(Transaction.to_user)
-            )\
-            .filter(Transaction.to_owner_id == user_id)\
-            .all()
-        return [TransactionResponse.model_validate(t) for t in transactions]
-
-    async def get_outgoing_transactions(self, user_id: int) -> List[TransactionResponse]:
+        return await self._listing_page(
+            [Transaction.to_owner_id == user_id],
+            status, created_after, created_before, cursor, limit
+        )
+
+    async def get_outgoing_transactions(
+        self,
+        user_id: int,
+        status: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
         """Get outgoing transactions where user is the requester"""
-        transactions = self.db.query(Transaction)\
-            .options(
-                joinedload(Transaction.material),
-                joinedload(Transaction.from_user),
-                joinedload(Transaction.to_user)
-            )\
-            .filter(Transaction.from_owner_id == user_id)\
-            .all()
-        return [TransactionResponse.model_validate(t) for t in transactions]
+        return await self._listing_page(
+            [Transaction.from_owner_id == user_id],
+            status, created_after, created_before, cursor, limit
+        )
 
     async def get_transaction_stats(self, user_id: int) -> dict:
-        """Get transaction statistics for a user"""
-        try:
-            total = self.db.query(Transaction).filter(
-                (Transaction.from_owner_id == user_id) | 
-                (Transaction.to_owner_id == user_id)
-            ).count()
-            
-            pending = self.db.query(Transaction).filter(
-                (Transaction.from_owner_id == user_id) | 
-                (Transaction.to_owner_id == user_id),
-                Transaction.status == TransactionStatus.PENDING
-            ).count()
-            
-            completed = self.db.query(Transaction).filter(
-                (Transaction.from_owner_id == user_id) | 
-                (Transaction.to_owner_id == user_id),
-                Transaction.status == TransactionStatus.COMPLETED
-            ).count()
-            
-            rejected = self.db.query(Transaction).filter(
-                (Transaction.from_owner_id == user_id) | 
-                (Transaction.to_owner_id == user_id),
-                Transaction.status.in_([TransactionStatus.REJECTED, TransactionStatus.CANCELLED])
-            ).count()
-            
-            return {
-                "total": total,
-                "pending": pending,
-                "completed": completed,
-                "rejected": rejected
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        """Get transaction statistics for a user. The route's response cache holds
+        them when one is configured; otherwise stats_cache does."""
+        local = cache_backend() is None
+        if local:
+            cached = stats_cache.get(user_id)
+            if cached is not None:
+                return dict(cached)
 
-    async def complete_transaction(self, transaction_id: int, user_id: int) -> TransactionResponse:
-        """Complete a transaction"""
         try:
-            transaction = self.db.query(Transaction).filter(Transaction.id == transaction_id).first()
-            if not transaction:
-                raise HTTPException(status_code=404, detail="Transaction not found")
-            
-            # Verify user is authorized (must be the receiver)
-            if transaction.to_owner_id != user_id:
-                raise HTTPException(status_code=403, detail="Not authorized to complete this transaction")
-
-            # Can only complete accepted transactions
-            if transaction.status != TransactionStatus.ACCEPTED.value:
-                raise HTTPException(status_code=400, detail="Can only complete accepted transactions")
-
-            transaction.status = TransactionStatus.COMPLETED.value
-            
-            # Create notification for the sender
-            notification = Notification(
-                title="Transaction Completed",
-                type="transaction",
-                message=f"Transaction #{transaction.id} has been completed",
-                user_id=transaction.from_owner_id,
-                read=False
+            # One GROUP BY over both sides of the user's trades. UNION ALL instead of
+            # an OR lets each branch use its (owner, status) index; the second branch
+            # skips trades with themselves so they are not counted twice.
+            sent = select(Transaction.status).where(Transaction.from_owner_id == user_id)
+            received = select(Transaction.status).where(
+                Transaction.to_owner_id == user_id,
+                Transaction.from_owner_id != user_id
             )
-            self.db.add(notification)
-            
-            self.db.commit()
-            self.db.refresh(transaction)
-            return TransactionResponse.model_validate(transaction)
+            trades = union_all(sent, received).subquery()
+            rows = await self.db.execute(
+                select(trades.c.status, func.count()).group_by(trades.c.status)
+            )
+            counts = {getattr(status, "value", status): count for status, count in rows}
+
+            stats = {
+                "total": sum(counts.values()),
+                "pending": counts.get(TransactionStatus.PENDING.value, 0),
+                "completed": counts.get(TransactionStatus.COMPLETED.value, 0),
+                "rejected": counts.get(TransactionStatus.REJECTED.value, 0) +
+                    counts.get(TransactionStatus.CANCELLED.value, 0)
+            }
+            if local:
+                stats_cache.set(user_id, stats)
+            return dict(stats)
 
         except Exception as e:
-            self.db.rollback()
             raise HTTPException(status_code=500, detail=str(e))
 
-    def get_all_transactions(self) -> List[Transaction]:
-        """Get all transactions with related data"""
+    async def _invalidate(self, transaction: Transaction, stock_changed: bool = False) -> None:
+        """Drop cached stats: the dashboard's and both parties' /transactions/stats,
+        and the catalog when the listing's quantity changed"""
+        stats_cache.pop(transaction.from_owner_id)
+        stats_cache.pop(transaction.to_owner_id)
+        await invalidate(
+            TRANSACTIONS,
+            user_tag(TRANSACTIONS, transaction.from_owner_id),
+            user_tag(TRANSACTIONS, transaction.to_owner_id),
+            *([MATERIALS] if stock_changed else [])
+        )
+        if stock_changed:
+            await publish_material_event("updated", transaction.material_id)
+
+    async def complete_transaction(self, transaction_id: int, user_id: int) -> TransactionResponse:
+        """Complete an accepted transaction; its quantity leaves stock"""
+        return await self.update_transaction_status(transaction_id, TransactionStatus.COMPLETED.value, user_id)
+
+    async def get_all_transactions(self) -> AsyncIterator[dict]:
+        """Every transaction, newest first, in TransactionResponse's shape, read from
+        a server-side cursor STREAM_BATCH_SIZE rows at a time. The generator owns
+        the session and closes it when the stream ends."""
+        query = self._listing_query()\
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())\
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
         try:
-            transactions = self.db.query(Transaction)\
-                .options(
-                    joinedload(Transaction.material),
-                    joinedload(Transaction.from_user),
-                    joinedload(Transaction.to_user)
-                )\
-                .all()
-            
-            # Debug logging
-            print("Raw transactions from DB:", transactions)
-            
-            # Verify material relationship
-            for transaction in transactions:
-                if not transaction.material:
-                    print(f"Warning: Transaction {transaction.id} has no material")
-                    
-            return transactions
-        except Exception as e:
-            print("Error in get_all_transactions:", str(e))
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {str(e)}"
-            )
+            async for row in await self.db.stream(query):
+                yield self._row_to_item(row)
+        finally:
+            await self.db.close()
 
-    def get_transaction(self, transaction_id: int):
-        transaction = self.db.query(Transaction)\
-            .options(
-                joinedload(Transaction.material),
-                joinedload(Transaction.from_user),
-                joinedload(Transaction.to_user)
-            )\
-            .filter(Transaction.id == transaction_id)\
-            .first()
+    async def get_transaction(self, transaction_id: int, user_id: int):
+        transaction = await self._load(transaction_id)
         
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction not found")
+        if user_id not in (transaction.from_owner_id, transaction.to_owner_id):
+            raise HTTPException(status_code=403, detail="Not authorized to view this transaction")
         return transaction
-
-    def update_transaction_status(self, transaction_id: int, status: str):
-        transaction = self.get_transaction(transaction_id)
-        transaction.status = status
-        self.db.commit()
-        self.db.refresh(transaction)
-        return self.get_transaction(transaction_id)  # Get fresh copy with all relationships 
\ No newline at end of file
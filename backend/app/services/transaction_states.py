@@ -0,0 +1,38 @@
+from typing import Dict, Tuple
+from fastapi import HTTPException
+from app.models.models import Transaction, TransactionStatus
+
+# The listing's owner sells (to_owner_id); the user who asked for it buys (from_owner_id)
+SELLER = "seller"
+BUYER = "buyer"
+
+# Every allowed status change and the party that may make it. Rejected,
+# completed and cancelled are final.
+TRANSITIONS: Dict[Tuple[TransactionStatus, TransactionStatus], str] = {
+    (TransactionStatus.PENDING, TransactionStatus.ACCEPTED): SELLER,
+    (TransactionStatus.PENDING, TransactionStatus.REJECTED): SELLER,
+    (TransactionStatus.PENDING, TransactionStatus.CANCELLED): BUYER,
+    (TransactionStatus.ACCEPTED, TransactionStatus.COMPLETED): SELLER,
+    (TransactionStatus.ACCEPTED, TransactionStatus.CANCELLED): BUYER,
+}
+
+# Statuses in which a transaction holds its quantity of the listing
+HOLDING_STATUSES = {TransactionStatus.PENDING.value, TransactionStatus.ACCEPTED.value}
+
+def check_transition(transaction: Transaction, new_status: str, user_id: int) -> TransactionStatus:
+    """Raise unless `user_id` may move the transaction to `new_status`: 403 for
+    the wrong party, 409 when the transaction's current status does not allow it"""
+    if user_id not in (transaction.from_owner_id, transaction.to_owner_id):
+        raise HTTPException(status_code=403, detail="Not authorized to update this transaction")
+    current = TransactionStatus(transaction.status)
+    new = TransactionStatus(new_status)
+    party = TRANSITIONS.get((current, new))
+    if party is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Cannot change a transaction from {current.value} to {new.value}"
+        )
+    owner_id = transaction.to_owner_id if party == SELLER else transaction.from_owner_id
+    if owner_id != user_id:
+        raise HTTPException(status_code=403, detail=f"Only the {party} can mark this transaction {new.value}")
+    return new
@@ -0,0 +1,24 @@
+import os
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.outbox import consumer
+
+# Transaction events are POSTed here as JSON when set; failures are retried by the outbox
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "5"))
+
+_client = None
+
+def client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT)
+    return _client
+
+async def post_webhook(db: AsyncSession, topic: str, event: dict):
+    """Delivery is at least once; receivers should ignore a repeated transaction_id and topic"""
+    response = await client().post(WEBHOOK_URL, json={"topic": topic, "data": event})
+    response.raise_for_status()
+
+if WEBHOOK_URL:
+    consumer("webhook", "transaction.created", "transaction.status_changed", "transaction.completed")(post_webhook)
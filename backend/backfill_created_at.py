@@ -0,0 +1,35 @@
+"""Date listings that were saved without created_at, then enforce NOT NULL.
+
+    python backfill_created_at.py
+    python backfill_created_at.py --batch-size 1000
+
+The catalog pages by (created_at, id), which never matches a NULL created_at,
+so undated listings could not be reached past the first page. They are given
+the oldest listing's date, keeping them at the end of the catalog. On
+PostgreSQL the column is then made NOT NULL; SQLite cannot alter it in place,
+and new rows are always dated by the application. Safe to run again.
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.database import SessionLocal, engine
+from app.services.material_service import backfill_created_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        updated = backfill_created_at(db, args.batch_size)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE materials ALTER COLUMN created_at SET NOT NULL")
+    print(f"dated {updated:,} listings in {time.perf_counter() - started:.1f}s", flush=True)
+
+if __name__ == "__main__":
+    main()
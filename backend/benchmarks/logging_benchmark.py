@@ -0,0 +1,138 @@
+"""Latency of the transactions listing under different per-row logging styles.
+
+    python benchmarks/logging_benchmark.py --transactions 5000 --requests 200 --limit 200
+
+Modes:
+  print          four print() lines per row, as get_user_transactions used to do
+  debug-sampled  the same four lines as logger.debug through the queue handler,
+                 with DEBUG enabled and the default per-call-site rate limit
+  info           the production path: DEBUG disabled, nothing written per row
+
+Output goes to --sink if given, otherwise to a line-buffered pipe drained by a
+reader thread, which is what stdout is under a process manager or container.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.log import configure_logging, get_logger, shutdown_logging
+from app.db.database import Base, SyncSessionAdapter
+from app.models.models import Material, Transaction, User
+from app.services.transaction_service import TransactionService
+
+logger = get_logger("benchmarks.transactions")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def seed(session, transactions: int, rng: random.Random) -> int:
+    users = [User(email=f"bench{i}@example.com", username=f"bench{i}", hashed_password="x", company_name=f"Company {i}")
+             for i in range(20)]
+    session.add_all(users)
+    session.flush()
+    materials = [Material(name=f"Material {i}", quantity=1000, unit="kg", owner_id=users[i % 20].id,
+                          industry="Metalworks", location="Tunis", condition="Used", status="available")
+                 for i in range(200)]
+    session.add_all(materials)
+    session.flush()
+    start = datetime(2024, 1, 1)
+    session.add_all([
+        Transaction(
+            material_id=materials[i % 200].id,
+            from_owner_id=users[0].id if i % 2 else users[rng.randrange(1, 20)].id,
+            to_owner_id=users[rng.randrange(1, 20)].id if i % 2 else users[0].id,
+            quantity=1,
+            status="pending",
+            created_at=start + timedelta(minutes=i)
+        )
+        for i in range(transactions)
+    ])
+    session.commit()
+    return users[0].id
+
+def drain(fd):
+    while os.read(fd, 65536):
+        pass
+
+def log_rows_with_print(page):
+    for t in page.items:
+        print(f"Transaction {t.id}:")
+        print(f"  Material: {t.material.name if t.material else 'None'}")
+        print(f"  From User: {t.from_user.username if t.from_user else 'None'}")
+        print(f"  To User: {t.to_user.username if t.to_user else 'None'}")
+
+def log_rows_with_logger(page):
+    for t in page.items:
+        logger.debug("Transaction listed", extra={"transaction_id": t.id})
+        logger.debug("Transaction material", extra={"material": t.material.name})
+        logger.debug("Transaction sender", extra={"username": t.from_user.username})
+        logger.debug("Transaction recipient", extra={"username": t.to_user.username})
+
+MODES = {
+    "print": log_rows_with_print,
+    "debug-sampled": log_rows_with_logger,
+    "info": None,
+}
+
+def run(service, user_id, requests, limit, sink):
+    """Interleave the modes request by request so drift affects them all equally"""
+    latencies = {mode: [] for mode in MODES}
+    with redirect_stdout(sink):
+        for _ in range(requests):
+            for mode, log_rows in MODES.items():
+                # Per-logger level, as LOG_LEVELS would set it, so library DEBUG output stays off
+                logger.setLevel(logging.DEBUG if mode == "debug-sampled" else logging.INFO)
+                start = time.perf_counter()
+                page = asyncio.run(service.get_user_transactions(user_id, limit=limit))
+                if log_rows:
+                    log_rows(page)
+                latencies[mode].append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=200, help="page size of each listing request")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sink", help="file that log output is written to (default: a pipe)")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user_id = seed(session, args.transactions, random.Random(args.seed))
+    service = TransactionService(SyncSessionAdapter(session))
+
+    if args.sink:
+        sink = open(args.sink, "a", buffering=1)
+    else:
+        read_fd, write_fd = os.pipe()
+        threading.Thread(target=drain, args=(read_fd,), daemon=True).start()
+        sink = open(write_fd, "w", buffering=1)
+    with sink:
+        configure_logging(stream=sink)
+        run(service, user_id, 5, args.limit, sink)  # warm up
+        results = run(service, user_id, args.requests, args.limit, sink)
+        shutdown_logging()
+
+    baseline = percentile(results["print"], 50)
+    for mode, latencies in results.items():
+        p50 = percentile(latencies, 50)
+        print(f"{mode:>14}: p50={p50:.2f}ms p95={percentile(latencies, 95):.2f}ms "
+              f"p99={percentile(latencies, 99):.2f}ms ({p50 / baseline:.0%} of print)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Latency of ordinary requests while a storm of logins is being verified.
+
+    python benchmarks/login_benchmark.py --logins 400 --concurrency 100
+    python benchmarks/login_benchmark.py --rounds 12 --workers 2 --max-slowdown 3
+
+One client repeatedly requests GET /api/materials, first alone to get a
+baseline and then while --concurrency clients post --logins logins through
+POST /api/auth/login, all served in-process through httpx's ASGI transport.
+Reports login throughput and latency, and the probe's latency in both phases.
+Exits non-zero if the probe's p95 during the storm is more than
+--max-slowdown times its baseline (or --floor-ms, whichever is larger): a
+password check that ran on the event loop would hold every probe for the
+full bcrypt cost.
+
+Rate limits are lifted for the run; every login is a correct password. The
+database is scratch: its tables are dropped and recreated.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+
+PASSWORD = "password123"
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summary(samples):
+    return (f"{len(samples):>6}  p50={percentile(samples, 50):.2f}ms "
+            f"p95={percentile(samples, 95):.2f}ms max={max(samples, default=0):.2f}ms")
+
+async def run(args) -> bool:
+    import httpx
+    from app.main import app
+    from app.db.database import Base, SessionLocal, engine
+    from app.models.models import Material, User
+    from app.core.passwords import PASSWORD_HASH_WORKERS, get_password_hash
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    hashed_password = get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        users = [
+            User(email=f"user{i}@bench.example", username=f"user{i}", hashed_password=hashed_password,
+                 company_name=f"Company {i}")
+            for i in range(args.users)
+        ]
+        db.add_all(users)
+        db.flush()
+        db.add_all([
+            Material(name=f"Listing {i}", description="bench", industry="Metalworks", quantity=10, unit="kg",
+                     location="Tunis", condition="Used", status="available", owner_id=users[i % len(users)].id)
+            for i in range(50)
+        ])
+        db.commit()
+        emails = [user.email for user in users]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        response = await client.post("/api/auth/login", data={"username": emails[0], "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def probe(samples, until):
+            while not until():
+                start = time.perf_counter()
+                response = await client.get("/api/materials", params={"limit": 20}, headers=headers)
+                samples.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                await asyncio.sleep(args.probe_interval)
+
+        baseline = []
+        deadline = time.perf_counter() + args.baseline_seconds
+        await probe(baseline, lambda: time.perf_counter() >= deadline)
+
+        logins, errors = [], {}
+        remaining = iter(range(args.logins))
+        done = asyncio.Event()
+
+        async def user(index):
+            for n in remaining:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/auth/login",
+                    data={"username": emails[(index + n) % len(emails)], "password": PASSWORD}
+                )
+                if response.status_code == 200:
+                    logins.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+        async def storm():
+            await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+            done.set()
+
+        during = []
+        start = time.perf_counter()
+        await asyncio.gather(storm(), probe(during, done.is_set))
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.logins} logins at bcrypt cost {args.rounds}, {args.concurrency} concurrent, "
+          f"{PASSWORD_HASH_WORKERS} hashing threads: {len(logins) / elapsed:.1f} logins/s")
+    print(f"  {'login':>8}: {summary(logins)}")
+    if errors:
+        print(f"  errors by status: {errors}")
+    print(f"  {'baseline':>8}: {summary(baseline)}")
+    print(f"  {'storm':>8}: {summary(during)}")
+    allowed = max(args.max_slowdown * percentile(baseline, 95), args.floor_ms)
+    if percentile(during, 95) > allowed:
+        print(f"FAIL: probe p95 during the storm exceeds {allowed:.2f}ms")
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./login_benchmark.db")
+    parser.add_argument("--db-mode", choices=["async", "sync"], help="DB_MODE for the app (default: its own default)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor (PASSWORD_HASH_ROUNDS)")
+    parser.add_argument("--workers", type=int, help="hashing threads (PASSWORD_HASH_WORKERS, default: its own default)")
+    parser.add_argument("--baseline-seconds", type=float, default=3)
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="seconds between probe requests")
+    parser.add_argument("--max-slowdown", type=float, default=3)
+    parser.add_argument("--floor-ms", type=float, default=50, help="probe p95 always allowed during the storm")
+    args = parser.parse_args()
+
+    # The app binds these at import. The queue must hold every concurrent login
+    # or the excess is refused with 503 instead of measured.
+    os.environ.update(
+        DATABASE_URL=args.database_url, CACHE_BACKEND="none", LOG_LEVEL="WARNING",
+        PASSWORD_HASH_ROUNDS=str(args.rounds), PASSWORD_HASH_QUEUE=str(max(args.concurrency, 1)),
+        LOGIN_RATE_LIMIT_ACCOUNT="1000000/minute", LOGIN_RATE_LIMIT_IP="1000000/minute"
+    )
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    if args.db_mode:
+        os.environ["DB_MODE"] = args.db_mode
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Latency benchmark for the in-process material search index.
+
+    python benchmarks/search_benchmark.py --size 1000000 --queries 2000 --target-p99-ms 20
+
+Exits non-zero when the measured p99 exceeds the target.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.search_index import MaterialSearchIndex
+
+INDUSTRIES = [
+    "Automotive", "Electronics", "Textile", "Pharmaceuticals", "Food Processing",
+    "Metalworks", "Plastics", "Renewable Energy", "Construction Materials",
+    "Aerospace", "Furniture", "Chemicals", "Packaging", "Glass", "Paper"
+]
+MATERIALS = [
+    "Recycled Steel", "Plastic Granules", "Wood Scraps", "Glass Cullet", "Textile Waste",
+    "Paper Pulp", "Metal Shavings", "Rubber Waste", "Copper Wire", "Aluminium Offcuts",
+    "PET Flakes", "Cardboard Bales", "Solvent Residue", "Fly Ash", "Sawdust"
+]
+QUALIFIERS = ["clean", "sorted", "mixed", "industrial", "baled", "shredded", "food grade", "post consumer"]
+QUERIES = [
+    "steel", "plastic granules", "copper", "recycled metal", "glass", "pulp paper",
+    "aluminum", "cardbord", "texile waste", "shredded rubber", "fly", "wood"
+]
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="number of listings to index")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--target-p99-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = MaterialSearchIndex()
+
+    start = time.perf_counter()
+    for doc_id in range(1, args.size + 1):
+        name = rng.choice(MATERIALS)
+        index.add(
+            doc_id,
+            f"{name} lot {doc_id}",
+            f"{rng.choice(QUALIFIERS)} {name.lower()} available for reuse",
+            rng.choice(INDUSTRIES)
+        )
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        query = rng.choice(QUERIES)
+        start = time.perf_counter()
+        index.search(query, limit=20)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    p99 = percentile(latencies, 99)
+    print(f"indexed {args.size} listings in {build_seconds:.1f}s")
+    print(f"p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms p99={p99:.2f}ms")
+    if p99 > args.target_p99_ms:
+        print(f"FAIL: p99 {p99:.2f}ms exceeds target {args.target_p99_ms}ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
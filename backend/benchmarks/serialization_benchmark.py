@@ -0,0 +1,139 @@
+"""Serializing large listing pages: response models versus json_response.
+
+    python benchmarks/serialization_benchmark.py --rows 10000
+    python benchmarks/serialization_benchmark.py --rows 50000 --repeat 3
+
+Fills a scratch database with --rows listings and --rows transactions, reads
+one page of each through MaterialService.get_materials and the transaction
+listing query, then serves those pages from a bare FastAPI app two ways,
+through httpx's ASGI transport:
+
+  models  the previous path: a response model built per row, then FastAPI's
+          response_model validation and JSON encoding
+  fast    json_response: the plain rows encoded with orjson and returned as a
+          raw Response
+
+The SQL is run once up front, so the timings cover building and encoding the
+body only. Exits non-zero if the two bodies differ.
+
+The database is scratch: its tables are dropped and recreated.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+
+def seed(rows: int) -> int:
+    from app.db.database import Base, SessionLocal, engine
+    from app.models.models import Material, Transaction, TransactionStatus, User
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        seller = User(email="seller@bench.example", username="seller", hashed_password="x", company_name="Seller Ltd")
+        buyer = User(email="buyer@bench.example", username="buyer", hashed_password="x", company_name="Buyer Ltd")
+        db.add_all([seller, buyer])
+        db.flush()
+        materials = [
+            Material(name=f"Copper wire {i}", description="Stripped, mixed gauges", industry="Metalworks",
+                     quantity=100 + i % 50, unit="kg", location="Tunis", condition="Used", status="available",
+                     owner_id=seller.id, created_at=start + timedelta(minutes=i))
+            for i in range(rows)
+        ]
+        db.add_all(materials)
+        db.flush()
+        db.add_all([
+            Transaction(material_id=materials[i].id, from_owner_id=buyer.id, to_owner_id=seller.id, quantity=1.5,
+                        status=TransactionStatus.PENDING.value, message="Can you deliver next week?",
+                        created_at=start + timedelta(minutes=i))
+            for i in range(rows)
+        ])
+        db.commit()
+        return buyer.id
+
+async def run(args) -> bool:
+    import httpx
+    from fastapi import FastAPI
+    from app.core.serialization import json_response
+    from app.db.database import get_session
+    from app.models.models import Transaction
+    from app.schemas.material import MaterialResponse
+    from app.schemas.pagination import Page
+    from app.schemas.transaction_schema import TransactionResponse
+    from app.services.material_service import MaterialService
+    from app.services.transaction_service import TransactionService
+
+    buyer_id = seed(args.rows)
+    async for db in get_session():
+        start = time.perf_counter()
+        materials = await MaterialService(db).get_materials(limit=args.rows)
+        transactions = await TransactionService(db)._listing_page(
+            [Transaction.from_owner_id == buyer_id], None, None, None, None, args.rows
+        )
+        print(f"read {len(materials['items'])} listings and {len(transactions['items'])} transactions "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    bench = FastAPI()
+
+    @bench.get("/models/materials", response_model=Page[MaterialResponse])
+    async def materials_models():
+        return Page[MaterialResponse](items=[MaterialResponse(**item) for item in materials["items"]],
+                                      next_cursor=materials["next_cursor"])
+
+    @bench.get("/fast/materials", response_model=Page[MaterialResponse])
+    async def materials_fast():
+        return json_response(materials)
+
+    @bench.get("/models/transactions", response_model=Page[TransactionResponse])
+    async def transactions_models():
+        return Page[TransactionResponse](items=[TransactionResponse(**item) for item in transactions["items"]],
+                                         next_cursor=transactions["next_cursor"])
+
+    @bench.get("/fast/transactions", response_model=Page[TransactionResponse])
+    async def transactions_fast():
+        return json_response(transactions)
+
+    ok = True
+    transport = httpx.ASGITransport(app=bench)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for listing in ("materials", "transactions"):
+            timings, bodies = {}, {}
+            for path in ("models", "fast"):
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await client.get(f"/{path}/{listing}")
+                    samples.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                timings[path] = min(samples)
+                bodies[path] = response.content
+            size = len(bodies["fast"]) / 1e6
+            print(f"{listing}: {args.rows} rows, {size:.1f} MB")
+            for path, seconds in timings.items():
+                print(f"  {path:>6}: {seconds * 1000:8.1f}ms  {args.rows / seconds:10.0f} rows/s")
+            print(f"  speedup {timings['models'] / timings['fast']:.1f}x")
+            if json.loads(bodies["models"]) != json.loads(bodies["fast"]):
+                print(f"FAIL: {listing} bodies differ")
+                ok = False
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./serialization_benchmark.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5, help="requests per path; the fastest is reported")
+    args = parser.parse_args()
+
+    # The app binds these at import
+    os.environ.update(DATABASE_URL=args.database_url, CACHE_BACKEND="none", LOG_LEVEL="WARNING")
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Deliver outbox events outside the API processes.
+
+    OUTBOX_WORKER=false uvicorn app.main:app --workers 4
+    python outbox_worker.py
+
+By default each API process drains the outbox itself. Set OUTBOX_WORKER=false
+on the API and run this instead to keep consumers such as webhooks off the
+request-serving event loops. Several copies can run at once; on PostgreSQL
+they claim disjoint batches. Set REDIS_URL for both, so the notifications this
+process stores reach streams and cached counts in the API processes.
+"""
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.log import configure_logging
+from app.core.cache import init_cache
+from app.services.outbox import OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, OutboxWorker
+import app.services.notification_service  # noqa: F401 - registers the notification consumer
+import app.services.webhook_service  # noqa: F401 - registers the webhook consumer when configured
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-seconds", type=float, default=OUTBOX_POLL_SECONDS)
+    args = parser.parse_args()
+
+    configure_logging()
+    # Consumers retire cached unread counts and publish to open streams
+    init_cache()
+    asyncio.run(OutboxWorker(args.batch_size, args.poll_seconds).run())
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.database import SessionLocal
 from app.models.models import User, Material, Transaction, UserRole, TransactionStatus
-from app.core.security import get_password_hash
+from app.core.passwords import get_password_hash
+from app.services.geo_service import backfill_coordinates
+from app.services.rollup_service import RollupService
 import random
 from datetime import datetime, timedelta
 
@@ -14,11 +16,13 @@ def populate_db():
         # Create some regular users
         users = []
         companies = ["EcoTech", "GreenCycle", "ReuseHub", "CircularInc", "WasteNot"]
+        # bcrypt is deliberately slow; every sample user shares one password
+        hashed_password = get_password_hash("password123")
         for i in range(5):
             user = User(
                 email=f"user{i+1}@example.com",
                 username=f"user{i+1}",
-                hashed_password=get_password_hash("password123"),
+                hashed_password=hashed_password,
                 company_name=companies[i],
                 role=UserRole.USER.value
             )
@@ -56,6 +60,7 @@ def populate_db():
                 db.add(material)
                 materials.append(material)
         db.commit()
+        backfill_coordinates(db)
 
         # Create transactions
         statuses = [status.value for status in TransactionStatus]
@@ -78,6 +83,7 @@ def populate_db():
             db.add(transaction)
         
         db.commit()
+        RollupService(db).rebuild()
         print("Sample data created successfully!")
         
     except Exception as e:
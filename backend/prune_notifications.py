@@ -0,0 +1,32 @@
+"""Delete read notifications older than a retention period. Run it from cron.
+
+    python prune_notifications.py --days 90
+    python prune_notifications.py --days 30 --batch-size 1000
+
+Rows are deleted in batches, each in its own transaction, so the job never
+holds long locks or a large undo log against the live table. Unread
+notifications are kept however old they are.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.database import SessionLocal
+from app.services.notification_service import prune_read_notifications
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=90, help="keep read notifications newer than this")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        deleted = prune_read_notifications(db, datetime.utcnow() - timedelta(days=args.days), args.batch_size)
+    print(f"deleted {deleted:,} read notifications in {time.perf_counter() - started:.1f}s", flush=True)
+
+if __name__ == "__main__":
+    main()
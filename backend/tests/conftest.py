@@ -0,0 +1,87 @@
+import itertools
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The engines are built when app.db.database is imported, so point them at a
+# scratch database first. No Redis, and no outbox worker racing the tests.
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("EVENT_BUS", "local")
+os.environ.setdefault("OUTBOX_WORKER", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+from app.db.database import Base, SessionLocal, engine
+from app.main import app
+from app.core.principals import Principal, get_current_principal
+from app.models.models import Material, User
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+@pytest.fixture(autouse=True)
+def clean_tables(database):
+    yield
+    app.dependency_overrides.clear()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+@pytest.fixture(scope="session")
+def client(database):
+    # One event loop for the whole run; the async pool's connections belong to it
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def make_user(db):
+    numbers = itertools.count(1)
+
+    def make_user(**fields) -> User:
+        number = next(numbers)
+        user = User(
+            email=f"user{number}@example.com",
+            username=f"user{number}",
+            hashed_password="-",
+            company_name=f"Company {number}",
+            **fields
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make_user
+
+@pytest.fixture
+def make_material(db):
+    def make_material(owner: User, **fields) -> Material:
+        fields.setdefault("name", "Steel offcuts")
+        fields.setdefault("description", "Clean mild steel plate offcuts")
+        fields.setdefault("industry", "Metalworks")
+        fields.setdefault("location", "Tunis")
+        fields.setdefault("condition", "Used")
+        fields.setdefault("quantity", 10.0)
+        fields.setdefault("unit", "kg")
+        material = Material(owner_id=owner.id, **fields)
+        db.add(material)
+        db.commit()
+        return material
+    return make_material
+
+@pytest.fixture
+def act_as():
+    """Make the client's requests on behalf of `user`, skipping token checks"""
+    def act_as(user: User) -> None:
+        principal = Principal(user.id, user.email, user.role, user.company_name)
+        app.dependency_overrides[get_current_principal] = lambda: principal
+    return act_as
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import pytest
+
+@pytest.fixture
+def owner(make_user, act_as):
+    user = make_user()
+    act_as(user)
+    return user
+
+def walk(client, limit: int, **filters) -> list:
+    """Every page of the catalog in order, as lists of items"""
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **filters}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/materials", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+def test_pages_through_equal_timestamps(client, owner, make_material):
+    # Whole batches share a created_at, so pages must break ties on id
+    start = datetime(2024, 1, 1)
+    materials = [make_material(owner, created_at=start + timedelta(hours=i // 5)) for i in range(23)]
+    expected = [m.id for m in sorted(materials, key=lambda m: (m.created_at, m.id), reverse=True)]
+
+    for limit in (1, 3, 5, 7, 23, 50):
+        pages = walk(client, limit)
+        ids = [item["id"] for page in pages for item in page]
+        assert ids == expected
+        assert all(len(page) == limit for page in pages[:-1])
+
+def test_filters_apply_on_later_pages(client, owner, make_material):
+    start = datetime(2024, 1, 1)
+    for i in range(30):
+        make_material(
+            owner,
+            industry="Metalworks" if i % 2 else "Plastics",
+            location="Sfax" if i % 3 else "Tunis",
+            quantity=float(i),
+            created_at=start + timedelta(hours=i // 4)
+        )
+
+    pages = walk(client, 4, industry="Metalworks", min_quantity=5, max_quantity=25)
+    assert len(pages) > 1
+    items = [item for page in pages for item in page]
+    assert all(item["industry"] == "Metalworks" and 5 <= item["quantity"] <= 25 for item in items)
+    assert sorted(item["quantity"] for item in items) == [i for i in range(30) if i % 2 and 5 <= i <= 25]
+
+    second = client.get("/api/materials", params={
+        "limit": 2, "location": "Tunis",
+        "cursor": client.get("/api/materials", params={"limit": 2, "location": "Tunis"}).json()["next_cursor"]
+    }).json()
+    assert second["items"] and all(item["location"] == "Tunis" for item in second["items"])
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "!!!", "MjAyNC0wMS0wMQ", "eHx5"])
+def test_malformed_cursor_is_a_bad_request(client, owner, make_material, cursor):
+    make_material(owner)
+    response = client.get("/api/materials", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
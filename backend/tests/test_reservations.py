@@ -0,0 +1,96 @@
+import pytest
+from app.models.models import Material
+
+@pytest.fixture
+def parties(make_user):
+    return make_user(), make_user()
+
+def request_quantity(client, material_id: int, quantity: float):
+    return client.post("/api/transactions", json={"material_id": material_id, "quantity": quantity})
+
+def stock(db, material_id: int):
+    db.expire_all()
+    material = db.get(Material, material_id)
+    return material.quantity, material.reserved
+
+def test_request_holds_stock(client, db, parties, make_material, act_as):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    assert request_quantity(client, material.id, 4).status_code == 200
+    assert stock(db, material.id) == (10.0, 4.0)
+
+def test_request_beyond_what_is_left_is_refused(client, db, parties, make_material, act_as):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    assert request_quantity(client, material.id, 11).status_code == 409
+    assert request_quantity(client, material.id, 7).status_code == 200
+    # 3 left; the listing's full quantity no longer counts
+    assert request_quantity(client, material.id, 4).status_code == 409
+    assert request_quantity(client, material.id, 3).status_code == 200
+    assert request_quantity(client, material.id, 0.5).status_code == 409
+    assert stock(db, material.id) == (10.0, 10.0)
+
+def test_request_for_missing_listing(client, parties, act_as):
+    act_as(parties[1])
+    assert request_quantity(client, 12345, 1).status_code == 404
+
+@pytest.mark.parametrize("steps", [
+    [("seller", "rejected")],
+    [("buyer", "cancelled")],
+    [("seller", "accepted"), ("buyer", "cancelled")],
+])
+def test_reject_and_cancel_release_the_hold(client, db, parties, make_material, act_as, steps):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    transaction = request_quantity(client, material.id, 10).json()
+    assert request_quantity(client, material.id, 1).status_code == 409
+
+    for party, status in steps:
+        act_as(seller if party == "seller" else buyer)
+        response = client.patch(f"/api/transactions/{transaction['id']}/status", json={"status": status})
+        assert response.status_code == 200
+    assert stock(db, material.id) == (10.0, 0.0)
+
+    act_as(buyer)
+    assert request_quantity(client, material.id, 10).status_code == 200
+
+def test_accepting_keeps_the_hold(client, db, parties, make_material, act_as):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    transaction = request_quantity(client, material.id, 6).json()
+    act_as(seller)
+    client.patch(f"/api/transactions/{transaction['id']}/status", json={"status": "accepted"})
+    assert stock(db, material.id) == (10.0, 6.0)
+
+def test_complete_takes_the_hold_out_of_stock(client, db, parties, make_material, act_as):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    completed = request_quantity(client, material.id, 6).json()
+    open_request = request_quantity(client, material.id, 3).json()
+
+    act_as(seller)
+    client.patch(f"/api/transactions/{completed['id']}/status", json={"status": "accepted"})
+    assert client.post(f"/api/transactions/{completed['id']}/complete").status_code == 200
+    # The other request still holds its 3 of what is left
+    assert stock(db, material.id) == (4.0, 3.0)
+
+    act_as(buyer)
+    assert request_quantity(client, material.id, 2).status_code == 409
+    assert request_quantity(client, material.id, 1).status_code == 200
+    client.patch(f"/api/transactions/{open_request['id']}/status", json={"status": "cancelled"})
+    assert stock(db, material.id) == (4.0, 1.0)
+
+def test_seller_cannot_cut_stock_below_holds(client, db, parties, make_material, act_as):
+    seller, buyer = parties
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    request_quantity(client, material.id, 6)
+
+    act_as(seller)
+    assert client.put(f"/api/materials/{material.id}", json={"quantity": 5}).status_code == 409
+    assert stock(db, material.id) == (10.0, 6.0)
@@ -0,0 +1,119 @@
+import itertools
+from typing import NamedTuple
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from app.db.database import engine
+from app.models.models import Material, OutboxEvent, Transaction, TransactionStatus, User
+from app.services.transaction_service import TransactionService
+from app.services.transaction_states import SELLER, TRANSITIONS, check_transition
+
+BUYER_ID, SELLER_ID, OUTSIDER_ID = 1, 2, 3
+FORBIDDEN = [pair for pair in itertools.product(TransactionStatus, repeat=2) if pair not in TRANSITIONS]
+
+def transaction(status: TransactionStatus) -> Transaction:
+    return Transaction(from_owner_id=BUYER_ID, to_owner_id=SELLER_ID, status=status.value)
+
+@pytest.mark.parametrize("current, new", TRANSITIONS)
+def test_allowed_transition_by_its_party(current, new):
+    party_id = SELLER_ID if TRANSITIONS[current, new] == SELLER else BUYER_ID
+    assert check_transition(transaction(current), new.value, party_id) == new
+
+@pytest.mark.parametrize("current, new", TRANSITIONS)
+def test_allowed_transition_refused_to_the_other_party(current, new):
+    other_id = BUYER_ID if TRANSITIONS[current, new] == SELLER else SELLER_ID
+    with pytest.raises(HTTPException) as error:
+        check_transition(transaction(current), new.value, other_id)
+    assert error.value.status_code == 403
+
+@pytest.mark.parametrize("current, new", FORBIDDEN)
+def test_forbidden_transition(current, new):
+    for user_id in (BUYER_ID, SELLER_ID):
+        with pytest.raises(HTTPException) as error:
+            check_transition(transaction(current), new.value, user_id)
+        assert error.value.status_code == 409
+
+@pytest.mark.parametrize("current, new", list(TRANSITIONS) + FORBIDDEN)
+def test_outsider_may_not_change_anything(current, new):
+    with pytest.raises(HTTPException) as error:
+        check_transition(transaction(current), new.value, OUTSIDER_ID)
+    assert error.value.status_code == 403
+
+class Trade(NamedTuple):
+    seller: User
+    buyer: User
+    material_id: int
+    transaction: dict
+
+@pytest.fixture
+def trade(client, make_user, make_material, act_as) -> Trade:
+    seller, buyer = make_user(), make_user()
+    material = make_material(seller, quantity=10.0)
+    act_as(buyer)
+    response = client.post("/api/transactions", json={"material_id": material.id, "quantity": 4})
+    assert response.status_code == 200
+    return Trade(seller, buyer, material.id, response.json())
+
+def change_status(client, trade: Trade, status: str, version=None):
+    body = {"status": status} if version is None else {"status": status, "version": version}
+    return client.patch(f"/api/transactions/{trade.transaction['id']}/status", json=body)
+
+def test_status_changes_bump_the_version(client, trade, act_as):
+    assert trade.transaction["status"] == "pending"
+    assert trade.transaction["version"] == 1
+
+    act_as(trade.buyer)
+    assert change_status(client, trade, "accepted").status_code == 403
+    act_as(trade.seller)
+    accepted = change_status(client, trade, "accepted")
+    assert accepted.status_code == 200
+    assert accepted.json()["status"] == "accepted"
+    assert accepted.json()["version"] == 2
+
+    assert change_status(client, trade, "pending").status_code == 409
+    completed = client.post(f"/api/transactions/{trade.transaction['id']}/complete")
+    assert completed.status_code == 200
+    assert completed.json()["version"] == 3
+    assert change_status(client, trade, "cancelled").status_code == 409
+
+def test_stale_expected_version_is_refused(client, db, trade, act_as):
+    act_as(trade.seller)
+    assert change_status(client, trade, "accepted", version=trade.transaction["version"]).status_code == 200
+
+    act_as(trade.buyer)
+    response = change_status(client, trade, "cancelled", version=trade.transaction["version"])
+    assert response.status_code == 409
+
+    stored = db.get(Transaction, trade.transaction["id"])
+    assert stored.status == "accepted"
+    assert stored.version == 2
+    assert db.get(Material, trade.material_id).reserved == 4
+
+def test_concurrent_change_is_refused_and_rolled_back(client, db, trade, act_as, monkeypatch):
+    load = TransactionService._load
+
+    async def load_then_change_elsewhere(self, transaction_id):
+        found = await load(self, transaction_id)
+        monkeypatch.setattr(TransactionService, "_load", load)
+        # Another request commits a change between this one's read and its write
+        with engine.begin() as connection:
+            connection.execute(
+                update(Transaction)
+                .where(Transaction.id == transaction_id)
+                .values(version=Transaction.version + 1)
+            )
+        return found
+
+    monkeypatch.setattr(TransactionService, "_load", load_then_change_elsewhere)
+    events = db.scalar(select(func.count()).select_from(OutboxEvent))
+
+    act_as(trade.seller)
+    response = change_status(client, trade, "rejected")
+    assert response.status_code == 409
+
+    # Neither the status change, the release of the hold nor its event survived
+    stored = db.get(Transaction, trade.transaction["id"])
+    assert stored.status == "pending"
+    assert stored.version == 2
+    assert db.get(Material, trade.material_id).reserved == 4
+    assert db.scalar(select(func.count()).select_from(OutboxEvent)) == events
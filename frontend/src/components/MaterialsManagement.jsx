@@ -4,16 +4,18 @@ import { useAuth } from '../../hooks/useAuth';
 
 const MaterialsManagement = () => {
   const [materials, setMaterials] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const { user } = useAuth();
 
   useEffect(() => {
     loadMaterials();
   }, []);
 
-  const loadMaterials = async () => {
+  const loadMaterials = async (cursor = null) => {
     try {
-      const response = await materialsApi.getAll();
-      setMaterials(response.data);
+      const response = await materialsApi.getAll(cursor ? { cursor } : {});
+      setMaterials(prev => (cursor ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to load materials:', error);
     }
@@ -102,6 +104,14 @@ const MaterialsManagement = () => {
           </tbody>
         </table>
       </div>
+      {nextCursor && (
+        <button
+          onClick={() => loadMaterials(nextCursor)}
+          className="mt-4 text-blue-600 hover:text-blue-800"
+        >
+          Load more
+        </button>
+      )}
     </div>
   );
 };
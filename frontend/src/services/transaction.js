@@ -12,15 +12,18 @@ export const transactionsApi = {
     }
   },
 
-  // Get all transactions for the current user
-  getAll: async () => {
+  // Get a page of the current user's transactions; pass { cursor } for the next page
+  getAll: async (params = {}) => {
     try {
-      const response = await api.get('/api/transactions/');
+      const response = await api.get('/api/transactions/', { params });
       // Ensure each transaction has a material object
-      return response.data.map(transaction => ({
-        ...transaction,
-        material: transaction.material || {}  // Provide default empty object if material is null
-      }));
+      return {
+        ...response.data,
+        items: response.data.items.map(transaction => ({
+          ...transaction,
+          material: transaction.material || {}  // Provide default empty object if material is null
+        }))
+      };
     } catch (error) {
       console.error('Error fetching transactions:', error);
       throw error;
@@ -45,14 +48,14 @@ export const transactionsApi = {
   },
 
   // Get incoming transaction requests (for providers)
-  getIncoming: async () => {
-    const response = await api.get('/api/transactions/incoming');
+  getIncoming: async (params = {}) => {
+    const response = await api.get('/api/transactions/incoming', { params });
     return response.data;
   },
 
   // Get outgoing transaction requests (for requesters)
-  getOutgoing: async () => {
-    const response = await api.get('/api/transactions/outgoing');
+  getOutgoing: async (params = {}) => {
+    const response = await api.get('/api/transactions/outgoing', { params });
     return response.data;
   },
 